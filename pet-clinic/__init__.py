@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import cli
 from . import controllers
 from . import models
+from . import wizard
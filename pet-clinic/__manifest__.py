@@ -15,14 +15,16 @@ Long description of module's purpose
     # Check https://github.com/odoo/odoo/blob/15.0/odoo/addons/base/data/ir_module_category_data.xml
     # for the full list
     'category': 'Uncategorized',
-    'version': '0.1',
+    'version': '0.7',
 
     # any module necessary for this one to work correctly
-    'depends': ['base','calendar','account'],
+    'depends': ['base','calendar','account','stock'],
 
     # always loaded
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_sequence_data.xml',
+        'data/ir_cron_data.xml',
         
         # Menu
         'views/clinic_actions.xml',
@@ -32,6 +34,9 @@ Long description of module's purpose
         'views/service_views.xml',
         'views/dokter_views.xml',
         'views/client_clinic_views.xml',
+        'views/perf_stat_views.xml',
+        'views/job_views.xml',
+        'wizard/slot_finder_views.xml',
         
         # 'views/views.xml',
         'views/templates.xml',
@@ -0,0 +1,221 @@
+import csv
+import io
+import logging
+import optparse
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import odoo
+from odoo.cli import Command
+
+_logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = ['create_uid', 'create_date', 'write_uid', 'write_date']
+# Jam mulai hari kerja (UTC) dan jeda antar booking seorang dokter
+DAY_START_HOUR = 1
+SLOT_GAP_MINUTES = 10
+# Tanggal tetap agar seed yang sama menghasilkan data yang sama kapan pun perintah dijalankan
+DEFAULT_DATE_FROM = '2024-01-01'
+
+
+class PetClinicGenerate(Command):
+    """Generate a reproducible synthetic data set for load testing the pet clinic"""
+    name = 'pet_clinic_generate'
+
+    def run(self, cmdargs):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        group = optparse.OptionGroup(parser, "Generator Configuration")
+        group.add_option("--seed", dest="seed", type="int", default=42,
+                         help="Seed of the random generator, the same seed gives the same data.")
+        group.add_option("--partners", dest="partners", type="int", default=1000)
+        group.add_option("--pets", dest="pets", type="int", default=2000)
+        group.add_option("--categories", dest="categories", type="int", default=5)
+        group.add_option("--services", dest="services", type="int", default=20)
+        group.add_option("--doctors", dest="doctors", type="int", default=20)
+        group.add_option("--products", dest="products", type="int", default=50)
+        group.add_option("--bookings", dest="bookings", type="int", default=10000)
+        group.add_option("--date-from", dest="date_from", default=DEFAULT_DATE_FROM,
+                         help=f"First booking date (YYYY-MM-DD). Defaults to {DEFAULT_DATE_FROM}.")
+        group.add_option("--days", dest="days", type="int", default=365,
+                         help="Number of days over which the bookings are spread.")
+        group.add_option("--today", dest="today",
+                         help="Reference date (YYYY-MM-DD): bookings from this day on stay open, earlier ones "
+                              "are paid, not paid or cancelled. Defaults to the day after the last booking date.")
+        group.add_option("--batch-size", dest="batch_size", type="int", default=20000,
+                         help="Records created or copied per batch, each batch is committed.")
+        group.add_option("--payments", dest="payments", action="store_true", default=False,
+                         help="Create the payments of the confirmed and paid bookings.")
+        group.add_option("--skip-side-effects", dest="skip_side_effects", action="store_true", default=False,
+                         help="Do not create the calendar events and stock pickings of the bookings.")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(cmdargs)
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname:
+            sys.exit("The --database option is required.")
+
+        registry = odoo.registry(dbname)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {
+                'tracking_disable': True,
+                'mail_create_nolog': True,
+                'client_clinic_defer_side_effects': True,
+            })
+            PetClinicGenerator(env, opt).generate()
+
+
+class PetClinicGenerator:
+    """Insert master data with batched creates and bookings with COPY."""
+
+    def __init__(self, env, opt):
+        self.env = env
+        self.opt = opt
+        self.rng = random.Random(opt.seed)
+        self.date_from = date.fromisoformat(opt.date_from)
+        self.today = date.fromisoformat(opt.today) if opt.today else self.date_from + timedelta(days=opt.days)
+        self.now = datetime.now().replace(microsecond=0)
+
+    def generate(self):
+        opt = self.opt
+        categories = self._create('pet_category.pet_category', [{
+            'name': f"Kategori {i + 1}",
+            'rate': round(self.rng.uniform(0.8, 2.0), 2),
+        } for i in range(opt.categories)])
+        services = self._create('service.service', [{
+            'name': f"Layanan {i + 1}",
+            'price_service': self.rng.randrange(50, 500) * 1000,
+            'avg_time': self.rng.choice([15, 20, 30, 45, 60]),
+        } for i in range(opt.services)])
+        doctors = self._create('dokter.dokter', [{
+            'name': f"Dokter {i + 1}",
+            'specialty': self.rng.choice(["Umum", "Bedah", "Gigi", "Kulit"]),
+        } for i in range(opt.doctors)])
+        products = self._create('product.product', [{
+            'name': f"Produk {i + 1}",
+            'detailed_type': 'product',
+            'list_price': self.rng.randrange(10, 300) * 1000,
+        } for i in range(opt.products)])
+        partners = self._create('res.partner', [{
+            'name': f"Customer {i + 1}",
+            'phone': f"08{self.rng.randrange(10 ** 9, 10 ** 10)}",
+        } for i in range(opt.partners)])
+        # Setiap customer memiliki minimal satu peliharaan jika jumlah pet >= jumlah customer
+        pets = self._create('pet_clinic.pet_clinic', [{
+            'pet_name': f"Pet {i + 1}",
+            'pet_type': self.rng.choice(categories).id,
+            'pet_age': self.rng.randrange(1, 15),
+            'owner': partners[i % len(partners)].id,
+        } for i in range(opt.pets)])
+
+        booking_ids = self._copy_bookings(partners, pets, services, doctors, products)
+        self.env['client_clinic.sales_rollup']._rebuild(
+            self.date_from, self.date_from + timedelta(days=opt.days))
+        self.env.cr.commit()
+
+        Booking = self.env['client_clinic.client_clinic'].with_context(active_test=False)
+        for start in range(0, len(booking_ids), opt.batch_size):
+            bookings = Booking.browse(booking_ids[start:start + opt.batch_size])
+            # Produk booking yang belum terkirim ikut dipesan, seperti booking yang dibuat lewat ORM
+            bookings.filtered(lambda booking: booking.state == 'booking')._sync_reservations(check=False)
+            if opt.payments:
+                bookings._process_payments()
+            if not opt.skip_side_effects:
+                bookings._sync_calendar_events()
+                bookings.filtered(lambda booking: booking.state in ('not paid', 'paid'))._sync_stock_pickings()
+            self.env.cr.commit()
+            self.env.invalidate_all()
+        _logger.info("Generated %s bookings in %s", len(booking_ids), self.env.cr.dbname)
+
+    def _create(self, model, vals_list):
+        records = self.env[model].browse()
+        for start in range(0, len(vals_list), self.opt.batch_size):
+            records |= self.env[model].create(vals_list[start:start + self.opt.batch_size])
+            self.env.cr.commit()
+        _logger.info("Created %s %s", len(records), model)
+        return records
+
+    def _copy(self, table, columns, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        self.env.cr.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer)
+
+    def _copy_bookings(self, partners, pets, services, doctors, products):
+        """COPY the bookings and their lines, batch by batch, and return the booking ids."""
+        opt = self.opt
+        pets_by_owner = {}
+        for pet in pets:
+            pets_by_owner.setdefault(pet.owner.id, []).append((pet.id, pet.pet_type.rate))
+        customers = [partner_id for partner_id in partners.ids if partner_id in pets_by_owner]
+        service_data = [(service.id, service.price_service, service.avg_time) for service in services]
+        product_data = [(product.id, int(product.lst_price)) for product in products]
+        max_rate = max(rate for pet_list in pets_by_owner.values() for _pet, rate in pet_list)
+        slot = timedelta(minutes=int(2 * max(avg for _s, _p, avg in service_data) * max_rate) + SLOT_GAP_MINUTES)
+        per_doctor_day = -(-opt.bookings // (len(doctors) * opt.days))
+        if slot * per_doctor_day > timedelta(hours=24 - DAY_START_HOUR):
+            sys.exit(f"{per_doctor_day} bookings per doctor and day do not fit in a day, "
+                     f"increase --doctors or --days.")
+
+        Booking = self.env['client_clinic.client_clinic']
+        uid = self.env.uid
+        booking_columns = ['id', 'name', 'customer_id', 'booking_date', 'jam_antar', 'jam_selesai', 'worker_id',
+                           'total_time', 'total_price', 'payment_amount', 'state', 'active', 'payment_date',
+                           'payment_method_id'] + AUDIT_COLUMNS
+        line_columns = ['client_clinic_id', 'pet_id', 'service_id', 'real_price', 'real_time'] + AUDIT_COLUMNS
+        product_columns = ['client_clinic_id', 'pet_id', 'product_id', 'quantity_selected', 'total_price'] + AUDIT_COLUMNS
+        audit = [uid, self.now, uid, self.now]
+        journal = self.env['account.journal'].search([('type', 'in', ('bank', 'cash'))], limit=1)
+
+        booking_ids = []
+        for start in range(0, opt.bookings, opt.batch_size):
+            count = min(opt.batch_size, opt.bookings - start)
+            self.env.cr.execute(
+                "SELECT nextval('client_clinic_client_clinic_id_seq') FROM generate_series(1, %s)", [count])
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            names = Booking._get_next_booking_ids(count)
+
+            booking_rows, line_rows, product_rows = [], [], []
+            for offset, (booking_id, name) in enumerate(zip(ids, names)):
+                index = start + offset
+                doctor = doctors[index % len(doctors)]
+                day = self.date_from + timedelta(days=(index // len(doctors)) % opt.days)
+                position = index // (len(doctors) * opt.days)
+                jam_antar = datetime.combine(day, datetime.min.time()) + timedelta(hours=DAY_START_HOUR) + slot * position
+
+                customer_id = self.rng.choice(customers)
+                owner_pets = pets_by_owner[customer_id]
+                total_time = total_price = 0
+                for pet_id, rate in self.rng.sample(owner_pets, min(len(owner_pets), self.rng.choice([1, 1, 2]))):
+                    service_id, price, avg_time = self.rng.choice(service_data)
+                    real_price, real_time = int(price * rate), int(avg_time * rate)
+                    total_price += real_price
+                    total_time += real_time
+                    line_rows.append([booking_id, pet_id, service_id, real_price, real_time] + audit)
+                    if product_data and self.rng.random() < 0.3:
+                        product_id, lst_price = self.rng.choice(product_data)
+                        quantity = self.rng.randrange(1, 4)
+                        total_price += quantity * lst_price
+                        product_rows.append([booking_id, pet_id, product_id, quantity, quantity * lst_price] + audit)
+
+                if day >= self.today:
+                    state = 'booking'
+                else:
+                    state = self.rng.choices(['paid', 'not paid', 'cancel'], weights=[85, 10, 5])[0]
+                booking_rows.append([
+                    booking_id, name, customer_id, day, jam_antar,
+                    jam_antar + timedelta(minutes=total_time) if total_time else '', doctor.id,
+                    total_time, total_price, total_price, state, True, day if state != 'booking' else '',
+                    journal.id or '',
+                ] + audit)
+
+            self._copy('client_clinic_client_clinic', booking_columns, booking_rows)
+            self._copy('client_clinic_line', line_columns, line_rows)
+            self._copy('client_clinic_product_line', product_columns, product_rows)
+            self.env.cr.commit()
+            booking_ids.extend(ids)
+            _logger.info("Copied %s/%s bookings", len(booking_ids), opt.bookings)
+        return booking_ids
@@ -0,0 +1,35 @@
+import logging
+import optparse
+import sys
+from pathlib import Path
+
+import odoo
+from odoo.cli import Command
+
+_logger = logging.getLogger(__name__)
+
+
+class PetClinicRollup(Command):
+    """Rebuild the daily sales rollup of the pet clinic from the bookings"""
+    name = 'pet_clinic_rollup'
+
+    def run(self, cmdargs):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        group = optparse.OptionGroup(parser, "Rollup Configuration")
+        group.add_option("--date-from", dest="date_from",
+                         help="First booking date to rebuild (YYYY-MM-DD). Defaults to the oldest booking.")
+        group.add_option("--date-to", dest="date_to",
+                         help="Last booking date to rebuild (YYYY-MM-DD). Defaults to the latest booking.")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(cmdargs)
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname:
+            sys.exit("The --database option is required.")
+
+        registry = odoo.registry(dbname)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            count = env['client_clinic.sales_rollup']._rebuild(opt.date_from, opt.date_to)
+        _logger.info("Sales rollup of %s rebuilt (%s booking dates)", dbname, count)
@@ -1,22 +1,342 @@
 # -*- coding: utf-8 -*-
-# from odoo import http
+import csv
+import hashlib
+import io
+import json
+import logging
+import psycopg2
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
 
+from odoo import api, fields, http
+from odoo.exceptions import AccessError, UserError, ValidationError
+from odoo.http import request, content_disposition
 
-# class Pet-clinic(http.Controller):
-#     @http.route('/pet-clinic/pet-clinic', auth='public')
-#     def index(self, **kw):
-#         return "Hello, world"
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
 
-#     @http.route('/pet-clinic/pet-clinic/objects', auth='public')
-#     def list(self, **kw):
-#         return http.request.render('pet-clinic.listing', {
-#             'root': '/pet-clinic/pet-clinic',
-#             'objects': http.request.env['pet-clinic.pet-clinic'].search([]),
-#         })
+_logger = logging.getLogger(__name__)
 
-#     @http.route('/pet-clinic/pet-clinic/objects/<model("pet-clinic.pet-clinic"):obj>', auth='public')
-#     def object(self, obj, **kw):
-#         return http.request.render('pet-clinic.object', {
-#             'object': obj
-#         })
+# Jumlah booking yang dibaca per query saat ekspor
+EXPORT_CHUNK_SIZE = 500
+# Ukuran potongan file XLSX yang dikirim ke klien (byte)
+EXPORT_STREAM_BLOCK = 64 * 1024
 
+# Batas permintaan API per klien (user dan alamat IP) dalam satu jendela waktu.
+# Penghitungnya ada di memori proses, jadi batas ini berlaku per worker, bukan per server.
+API_RATE_LIMIT = 120
+API_RATE_WINDOW = 60  # detik
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 200
+
+# Resource API -> model, field yang boleh diminta, field default, apakah master data (pakai ETag),
+# dan field yang boleh diisi saat create (baris one2many dengan field barisnya sendiri)
+API_RESOURCES = {
+    'pets': {
+        'model': 'pet_clinic.pet_clinic',
+        'fields': ['pet_id', 'pet_name', 'pet_type', 'pet_age', 'owner'],
+        'default': ['pet_id', 'pet_name', 'pet_type', 'owner'],
+        'master': False,
+        'create': ['pet_name', 'pet_type', 'pet_age', 'owner'],
+    },
+    'bookings': {
+        'model': 'client_clinic.client_clinic',
+        'fields': ['name', 'customer_id', 'booking_date', 'jam_antar', 'jam_selesai', 'worker_id', 'state',
+                   'total_time', 'total_price', 'payment_method_id', 'description',
+                   'pet_service_lines', 'product_line_ids', 'phone', 'address', 'email'],
+        'default': ['name', 'customer_id', 'booking_date', 'jam_antar', 'jam_selesai', 'worker_id', 'state',
+                    'total_price'],
+        'master': False,
+        'create': ['customer_id', 'booking_date', 'jam_antar', 'worker_id', 'payment_method_id', 'description'],
+        'create_lines': {
+            'pet_service_lines': ['pet_id', 'service_id'],
+            'product_line_ids': ['pet_id', 'product_id', 'quantity_selected'],
+        },
+    },
+    'services': {
+        'model': 'service.service',
+        'fields': ['name', 'price_service', 'avg_time'],
+        'default': ['name', 'price_service', 'avg_time'],
+        'master': True,
+    },
+    'doctors': {
+        'model': 'dokter.dokter',
+        'fields': ['name', 'specialty', 'phone'],
+        'default': ['name', 'specialty'],
+        'master': True,
+    },
+    'categories': {
+        'model': 'pet_category.pet_category',
+        'fields': ['name', 'rate'],
+        'default': ['name', 'rate'],
+        'master': True,
+    },
+}
+
+_requests = defaultdict(deque)
+_requests_lock = threading.Lock()
+
+
+def _check_rate_limit(client):
+    """Return the seconds to wait when ``client`` exceeded its quota, else 0."""
+    now = time.monotonic()
+    with _requests_lock:
+        history = _requests[client]
+        while history and history[0] <= now - API_RATE_WINDOW:
+            history.popleft()
+        if len(history) >= API_RATE_LIMIT:
+            return int(history[0] + API_RATE_WINDOW - now) + 1
+        history.append(now)
+        # Klien yang sudah tidak aktif dibuang agar memori tidak terus bertambah
+        if len(_requests) > 10000:
+            for key in [key for key, values in _requests.items() if not values or values[-1] <= now - API_RATE_WINDOW]:
+                del _requests[key]
+    return 0
+
+
+EXPORT_HEADER = [
+    'Booking ID', 'Tanggal Booking', 'Status', 'Customer', 'Dokter', 'Jenis Baris',
+    'Peliharaan', 'Layanan', 'Produk', 'Jumlah', 'Waktu (Menit)', 'Total Harga',
+]
+
+
+class PetClinicExport(http.Controller):
+
+    @http.route('/pet-clinic/export/bookings', type='http', auth='user', methods=['GET'])
+    def export_bookings(self, date_from=None, date_to=None, file_format='csv', archived=None, **kw):
+        """Stream the bookings of a period with their service and product lines."""
+        if file_format not in ('csv', 'xlsx'):
+            return request.make_response("Unsupported export format", status=400)
+        if file_format == 'xlsx' and xlsxwriter is None:
+            return request.make_response("XLSX export requires the xlsxwriter library", status=400)
+
+        domain = []
+        if date_from:
+            domain.append(('booking_date', '>=', fields.Date.to_date(date_from)))
+        if date_to:
+            domain.append(('booking_date', '<=', fields.Date.to_date(date_to)))
+        context = dict(request.env.context)
+        if archived:
+            context['active_test'] = False
+        # Hak akses diperiksa sebelum respons mulai dikirim
+        request.env['client_clinic.client_clinic'].check_access_rights('read')
+
+        rows = self._iter_booking_rows(request.env.registry, request.env.uid, context, domain)
+        if file_format == 'xlsx':
+            body = self._stream_xlsx(rows)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            body = self._stream_csv(rows)
+            content_type = 'text/csv; charset=utf-8'
+        filename = f"bookings_{date_from or 'all'}_{date_to or 'all'}.{file_format}"
+        response = request.make_response(body, headers=[
+            ('Content-Type', content_type),
+            ('Content-Disposition', content_disposition(filename)),
+        ])
+        response.direct_passthrough = True
+        return response
+
+    def _iter_booking_rows(self, registry, uid, context, domain):
+        """Yield the export rows, chunk by chunk, using keyset pagination on ``id``."""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            Booking = env['client_clinic.client_clinic']
+            states = dict(Booking._fields['state']._description_selection(env))
+            last_id = 0
+            while True:
+                bookings = Booking.search(domain + [('id', '>', last_id)], order='id', limit=EXPORT_CHUNK_SIZE)
+                if not bookings:
+                    break
+                last_id = bookings[-1].id
+
+                # Muat relasi satu kali per chunk, bukan per baris
+                bookings.mapped('customer_id.name')
+                bookings.mapped('worker_id.name')
+                service_lines = bookings.mapped('pet_service_lines')
+                service_lines.mapped('pet_id.pet_name')
+                service_lines.mapped('service_id.name')
+                product_lines = bookings.mapped('product_line_ids')
+                product_lines.mapped('pet_id.pet_name')
+                product_lines.mapped('product_id.name')
+
+                for booking in bookings:
+                    base = [
+                        booking.name, fields.Date.to_string(booking.booking_date), states.get(booking.state, ''),
+                        booking.customer_id.name or '', booking.worker_id.name or '',
+                    ]
+                    yield base + ['booking', '', '', '', '', booking.total_time, booking.total_price]
+                    for line in booking.pet_service_lines:
+                        yield base + ['service', line.pet_id.pet_name or '', line.service_id.name or '', '',
+                                      1, line.real_time, line.real_price]
+                    for line in booking.product_line_ids:
+                        yield base + ['product', line.pet_id.pet_name or '', '', line.product_id.name or '',
+                                      line.quantity_selected, '', line.total_price]
+                env.invalidate_all()
+
+    def _stream_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADER)
+        for index, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if index % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    def _stream_xlsx(self, rows):
+        # Mode constant_memory menulis setiap baris ke file sementara, bukan ke memori
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+            worksheet = workbook.add_worksheet('Bookings')
+            worksheet.write_row(0, 0, EXPORT_HEADER)
+            for index, row in enumerate(rows, 1):
+                worksheet.write_row(index, 0, row)
+            workbook.close()
+
+            output.seek(0)
+            while True:
+                block = output.read(EXPORT_STREAM_BLOCK)
+                if not block:
+                    break
+                yield block
+
+
+class PetClinicApi(http.Controller):
+
+    def _json_error(self, message, status):
+        return request.make_json_response({'error': message}, status=status)
+
+    def _rate_limited(self):
+        retry_after = _check_rate_limit((request.env.uid, request.httprequest.remote_addr))
+        if not retry_after:
+            return None
+        response = self._json_error("Too many requests", 429)
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def _get_domain(self, resource, params):
+        """Filters supported by each resource, from the query string."""
+        domain = []
+        if resource == 'bookings':
+            if params.get('date_from'):
+                domain.append(('booking_date', '>=', fields.Date.to_date(params['date_from'])))
+            if params.get('date_to'):
+                domain.append(('booking_date', '<=', fields.Date.to_date(params['date_to'])))
+            if params.get('state'):
+                domain.append(('state', '=', params['state']))
+            if params.get('customer_id'):
+                domain.append(('customer_id', '=', int(params['customer_id'])))
+        elif resource == 'pets' and params.get('owner_id'):
+            domain.append(('owner', '=', int(params['owner_id'])))
+        return domain
+
+    def _get_etag(self, model, resource, params):
+        """Token of the master data table, changed by any create, write or delete."""
+        request.env[model].check_access_rights('read')
+        request.env.cr.execute(f'SELECT COUNT(*), MAX(write_date) FROM "{request.env[model]._table}"')
+        count, last_write = request.env.cr.fetchone()
+        key = json.dumps([resource, count, str(last_write), sorted(params.items())])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @http.route('/pet-clinic/api/<string:resource>', type='http', auth='user', methods=['GET'])
+    def api_list(self, resource, **params):
+        """List the records of ``resource`` ordered by id, one page at a time."""
+        config = API_RESOURCES.get(resource)
+        if not config:
+            return self._json_error("Unknown resource", 404)
+        limited = self._rate_limited()
+        if limited:
+            return limited
+
+        fnames = [fname for fname in params.get('fields', '').split(',') if fname] or config['default']
+        unknown = set(fnames) - set(config['fields'])
+        if unknown:
+            return self._json_error(f"Unknown fields: {', '.join(sorted(unknown))}", 400)
+        try:
+            # limit=0 berarti tanpa batas bagi search_fetch, dan limit negatif ditolak PostgreSQL
+            limit = max(1, min(int(params.get('limit', API_DEFAULT_LIMIT)), API_MAX_LIMIT))
+            after = max(0, int(params.get('after', 0)))
+            domain = self._get_domain(resource, params)
+        except ValueError:
+            return self._json_error("Invalid parameter", 400)
+
+        headers = []
+        if config['master']:
+            etag = self._get_etag(config['model'], resource, params)
+            headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+            if request.httprequest.if_none_match.contains(etag):
+                return request.make_response('', headers=headers, status=304)
+
+        try:
+            records = request.env[config['model']].search_fetch(
+                domain + [('id', '>', after)], fnames, limit=limit, order='id')
+            data = records.read(fnames)
+        except AccessError as error:
+            return self._json_error(str(error), 403)
+        response = request.make_json_response({
+            'records': data,
+            'next': records[-1].id if len(records) == limit else None,
+        })
+        response.headers.extend(headers)
+        return response
+
+    def _check_create_vals(self, config, vals):
+        """Return an error message when ``vals`` sets fields that cannot be created through the API."""
+        lines = config.get('create_lines', {})
+        unknown = set(vals) - set(config['create']) - set(lines)
+        for fname, line_fields in lines.items():
+            if fname not in vals:
+                continue
+            if not isinstance(vals[fname], list) or not all(isinstance(line, dict) for line in vals[fname]):
+                return f"{fname} must be a list of objects"
+            unknown.update(f"{fname}.{key}" for line in vals[fname] for key in set(line) - set(line_fields))
+        if unknown:
+            return f"Fields cannot be set: {', '.join(sorted(unknown))}"
+        return None
+
+    @http.route('/pet-clinic/api/session/csrf', type='http', auth='user', methods=['GET'])
+    def api_csrf_token(self):
+        """Return the CSRF token to send in the ``X-CSRF-Token`` header of POST requests."""
+        return request.make_json_response({'csrf_token': request.csrf_token()})
+
+    @http.route('/pet-clinic/api/<string:resource>', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_create(self, resource, **params):
+        """Create a pet or a booking from the JSON body of the request."""
+        config = API_RESOURCES.get(resource)
+        if not config or 'create' not in config:
+            return self._json_error("Resource cannot be created", 405)
+        # Token dibaca dari header karena body berisi JSON, bukan form
+        token = request.httprequest.headers.get('X-CSRF-Token')
+        if not token or not request.validate_csrf(token):
+            return self._json_error("Missing or invalid CSRF token", 403)
+        limited = self._rate_limited()
+        if limited:
+            return limited
+        try:
+            vals = json.loads(request.httprequest.get_data() or b'{}')
+        except ValueError:
+            return self._json_error("Invalid JSON body", 400)
+        if not isinstance(vals, dict):
+            return self._json_error("Invalid JSON body", 400)
+        error = self._check_create_vals(config, vals)
+        if error:
+            return self._json_error(error, 400)
+
+        Model = request.env[config['model']]
+        try:
+            if resource == 'bookings':
+                vals = Model._prepare_import_vals(vals)
+            with request.env.cr.savepoint():
+                record = Model.create(vals)
+                name = record.pet_id if resource == 'pets' else record.name
+        except AccessError as error:
+            return self._json_error(str(error), 403)
+        except (UserError, ValidationError, ValueError, TypeError, psycopg2.IntegrityError) as error:
+            return self._json_error(str(error), 400)
+        return request.make_json_response({'id': record.id, 'name': name}, status=201)
@@ -0,0 +1,7 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Isi rekap penjualan harian dari booking yang sudah ada
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['client_clinic.sales_rollup']._rebuild()
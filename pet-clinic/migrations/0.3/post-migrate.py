@@ -0,0 +1,12 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Lanjutkan sequence Booking ID dari nomor CL_ terbesar yang sudah terpakai
+    cr.execute("""
+        SELECT MAX(SUBSTRING(name FROM '^CL_([0-9]+)$')::int)
+          FROM client_clinic_client_clinic
+    """)
+    last_number = cr.fetchone()[0] or 0
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env.ref('pet-clinic.seq_client_clinic_booking').number_next = last_number + 1
@@ -0,0 +1,12 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Lanjutkan sequence ID Peliharaan dari nomor PET_ terbesar yang sudah terpakai
+    cr.execute("""
+        SELECT MAX(SUBSTRING(pet_id FROM '^PET_([0-9]+)$')::int)
+          FROM pet_clinic_pet_clinic
+    """)
+    last_number = cr.fetchone()[0] or 0
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env.ref('pet-clinic.seq_pet_clinic_pet').number_next = last_number + 1
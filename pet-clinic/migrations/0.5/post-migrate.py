@@ -0,0 +1,18 @@
+def migrate(cr, version):
+    # Tautkan booking lama ke event kalender yang dibuat dengan nama "<dokter> | <booking>"
+    cr.execute("""
+        UPDATE client_clinic_client_clinic b
+           SET calendar_event_id = match.event_id
+          FROM (
+                SELECT DISTINCT ON (b.id) b.id AS booking_id, e.id AS event_id
+                  FROM client_clinic_client_clinic b
+                  JOIN dokter_dokter d ON d.id = b.worker_id
+                  JOIN calendar_event e
+                    ON e.name = d.name || ' | ' || b.name
+                   AND e.start = b.jam_antar
+                   AND e.stop = b.jam_selesai
+                 WHERE b.calendar_event_id IS NULL
+              ORDER BY b.id, e.id DESC
+          ) match
+         WHERE b.id = match.booking_id
+    """)
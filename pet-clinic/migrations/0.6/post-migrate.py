@@ -0,0 +1,17 @@
+def migrate(cr, version):
+    # Tautkan booking lama ke payment yang dibuat dengan nama "Payment-<id booking>"
+    cr.execute("""
+        UPDATE client_clinic_client_clinic b
+           SET payment_id = match.payment_id
+          FROM (
+                SELECT DISTINCT ON (b.id) b.id AS booking_id, p.id AS payment_id
+                  FROM client_clinic_client_clinic b
+                  JOIN account_payment p ON p.partner_id = b.customer_id
+                  JOIN account_move m ON m.id = p.move_id
+                 WHERE b.payment_id IS NULL
+                   AND m.state != 'cancel'
+                   AND (m.name = 'Payment-' || b.id OR m.ref = 'Payment-' || b.id)
+              ORDER BY b.id, p.id DESC
+          ) match
+         WHERE b.id = match.booking_id
+    """)
@@ -0,0 +1,14 @@
+def migrate(cr, version):
+    # Sebelum 0.7 stok dikirim saat baris produk dibuat, lewat picking tanpa client_clinic_id.
+    # Catat jumlah itu sebagai sudah terkirim agar tidak dikirim ulang saat booking dikonfirmasi.
+    # Baris lama tidak memesan stok: reservasi hanya dibuat untuk baris baru atau yang diubah.
+    cr.execute("""
+        UPDATE client_clinic_product_line
+           SET quantity_delivered_legacy = quantity_selected,
+               quantity_reserved = 0
+         WHERE quantity_selected > 0
+    """)
+
+    # Index trigram buatan sendiri digantikan oleh index='trigram' pada field
+    for column in ('pet_name', 'pet_id', 'pet_display_name'):
+        cr.execute(f'DROP INDEX IF EXISTS pet_clinic_pet_clinic_{column}_trgm_idx')
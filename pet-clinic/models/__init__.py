@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-from . import pet, client, masterData
+from . import ir_sequence, perf_stats, job, pet, client, masterData, sales_rollup, stock, stock_reservation
@@ -1,27 +1,58 @@
-from odoo import models, fields, api
-from datetime import timedelta
+from odoo import models, fields, api, tools, Command
+from collections import defaultdict
+from datetime import datetime, time, timedelta
 import logging
-from odoo.exceptions import ValidationError
+import psycopg2
+from psycopg2.errors import SerializationFailure
+import pytz
+import threading
+from odoo.exceptions import UserError, ValidationError
+from .job import JOB_HANDLERS
+from .perf_stats import instrumented
+from .sales_rollup import cache_get, cache_put
 
 _logger = logging.getLogger(__name__)
 
+DASHBOARD_SECTIONS = ('chart', 'kpi', 'top_products')
+
+# Umur (hari) booking paid/cancel sebelum diarsipkan oleh cron
+ARCHIVE_AFTER_PARAM = 'pet_clinic.archive_after_days'
+ARCHIVE_AFTER_DEFAULT = 365
+
+# Jam kerja dokter (jam desimal, zona waktu user) dan jarak antar slot yang ditawarkan
+WORK_HOUR_START_PARAM = 'pet_clinic.work_hour_start'
+WORK_HOUR_END_PARAM = 'pet_clinic.work_hour_end'
+SLOT_STEP_PARAM = 'pet_clinic.slot_step_minutes'
+
+# Booking yang harganya masih mengikuti master data; paid dan cancel dibekukan
+OPEN_STATES = ('booking', 'not paid')
+REPRICE_CHUNK_SIZE = 5000
+
+# Key stok tersedia per produk di ``cr.precommit.data``, berlaku selama satu transaksi
+AVAILABLE_QTY_KEY = 'client_clinic.product_line.qty_available'
+
+# Perubahan pada field ini mempengaruhi event kalender booking
+CALENDAR_FIELDS = {'name', 'jam_antar', 'jam_selesai', 'worker_id', 'pet_service_lines', 'state'}
+
 class ClientClinic(models.Model):
     _name = 'client_clinic.client_clinic'
     _description = 'Client Clinic'
 
-    name = fields.Char(string="Booking ID", readonly=True, default=lambda self: self._get_next_booking_id())
+    name = fields.Char(string="Booking ID", readonly=True, copy=False, default='New')
     customer_id = fields.Many2one('res.partner', string="Customer", required=True)
     phone = fields.Char(related='customer_id.phone', string="Nomor Telepon", readonly=True)
     address = fields.Char(related='customer_id.contact_address', string="Alamat", readonly=True)
     email = fields.Char(related='customer_id.email', string="Email", readonly=True)
-    booking_date = fields.Date(string="Tanggal Booking", required=True)
+    booking_date = fields.Date(string="Tanggal Booking", required=True, index=True)
 
     pet_service_lines = fields.One2many('client_clinic.line', 'client_clinic_id', string="Peliharaan dan Layanan")
     product_line_ids = fields.One2many('client_clinic.product_line', 'client_clinic_id', string="Product Lines")
+    picking_ids = fields.One2many('stock.picking', 'client_clinic_id', string="Pengiriman Produk", readonly=True)
 
     jam_antar = fields.Datetime(string="Jam Antar", required=True)
     jam_selesai = fields.Datetime(string="Jam Selesai", compute="_compute_jam_selesai", store=True)
     worker_id = fields.Many2one('dokter.dokter', string="Dokter", required=True)
+    calendar_event_id = fields.Many2one('calendar.event', string="Event Kalender", readonly=True, copy=False, ondelete='set null')
 
     total_time = fields.Integer(string="Total Waktu (Menit)", compute="_compute_total_time", store=True)
     total_price = fields.Integer(string="Total Harga", compute="_compute_total_price", store=True)
@@ -33,6 +64,8 @@ class ClientClinic(models.Model):
         ('not paid', 'Not Paid'), 
         ('paid', 'Paid')  
     ], string="Status", default='booking', readonly=True)
+    # Booking lama yang sudah selesai diarsipkan, query default hanya membaca booking aktif
+    active = fields.Boolean(default=True)
 
     # payment_lines = fields.One2many('account.payment.line', 'client_clinic_id', string="Payment Lines")
 
@@ -42,6 +75,30 @@ class ClientClinic(models.Model):
     # Ubah field payment_amount
     payment_amount = fields.Integer(string="Jumlah Pembayaran", compute="_compute_payment_amount", store=True)
 
+    _sql_constraints = [
+        ('worker_no_overlap',
+         "EXCLUDE USING gist (worker_id WITH =, tsrange(jam_antar, jam_selesai) WITH &&) "
+         "WHERE (state != 'cancel' AND jam_selesai IS NOT NULL)",
+         "Dokter sudah dipesan pada jam tersebut. Silakan pilih jam atau dokter lain."),
+    ]
+
+    def _auto_init(self):
+        # Constraint worker_no_overlap membutuhkan btree_gist untuk operator "=" pada worker_id
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        except psycopg2.Error:
+            _logger.warning("Could not create the btree_gist extension, "
+                            "the worker_no_overlap constraint will not be enforced by the database.")
+        return super(ClientClinic, self)._auto_init()
+
+    def init(self):
+        # Index parsial hanya untuk data aktif, ukurannya tidak tumbuh bersama arsip
+        tools.create_index(self.env.cr, 'client_clinic_client_clinic_active_worker_idx', self._table,
+                           ['worker_id', 'jam_antar'], where='active')
+        tools.create_index(self.env.cr, 'client_clinic_client_clinic_active_booking_date_idx', self._table,
+                           ['booking_date'], where='active')
+
     # Tambahkan metode compute
     @api.depends('total_price')
     def _compute_payment_amount(self):
@@ -53,36 +110,42 @@ class ClientClinic(models.Model):
 
 
     def action_cancel(self): 
-        return self.write({"state": "cancel"}) 
+        res = self.write({"state": "cancel"}) 
+        # Lepas reservasi stok dan kembalikan stok produk yang sudah terkirim
+        self._sync_reservations()
+        self._schedule_side_effect('stock')
+        return res
 
     invoice_id = fields.Many2one('account.payment', string="Invoice", readonly=True)
+    payment_id = fields.Many2one('account.payment', string="Pembayaran", readonly=True, copy=False)
 
+    @instrumented
     def action_done(self):
-        """Mark the booking as done and create a payment record."""
+        """Mark the bookings as done and create their draft payments."""
         for record in self:
             if record.state == 'not paid':
                 raise ValidationError("This booking is already recorded.")
             if record.payment_amount <= 0:
                 raise ValidationError("Payment amount should be greater than zero.")
 
-            record.write({
-                'state': 'not paid',
-                'payment_date': fields.Date.today(),
-            })
+        self.write({
+            'state': 'not paid',
+            'payment_date': fields.Date.today(),
+        })
 
-            # Create a payment record
-            self.env['account.payment'].create({
-                'partner_id': record.customer_id.id,
-                'amount': record.payment_amount,
-                'payment_type': 'inbound',
-                'date': fields.Date.today(),
-                'name': f"Payment-{record.id}",
-                'journal_id': False, 
-                # Include any additional fields needed
-            })
+        # Create the payment records
+        self._schedule_side_effect('payment')
+
+        # Kirim produk semua booking sekaligus saat konfirmasi
+        self._schedule_side_effect('stock')
 
     def action_pay(self):
         """Mark the booking as paid, validate, confirm the invoice, and update the journal and date."""
+        return self.action_register_payments()
+
+    @instrumented
+    def action_register_payments(self):
+        """Register and post the payments of all the selected bookings."""
         for record in self:
             # Validation checks
             if record.state == 'paid':
@@ -92,97 +155,298 @@ class ClientClinic(models.Model):
             if not record.payment_method_id:
                 raise ValidationError("Please select a payment method.")
 
-            # Confirm the invoice if it exists
-            if record.invoice_id:
-                record.invoice_id.action_post()  # Confirm the invoice
-
-            # Update the state and payment date
-            record.write({
-                'state': 'paid',  # Update the state to 'paid'
-                'payment_date': fields.Date.today(),  # Update the payment date
-            })
-
-            # Find the existing payment record
-            payment_record = self.env['account.payment'].search([
-                ('partner_id', '=', record.customer_id.id),
-                ('amount', '=', record.payment_amount),
-                ('payment_type', '=', 'inbound'),
-                ('state', '!=', 'cancelled'),
-                ('name', '=', f"Payment-{record.id}"),
-            ], limit=1)
-
-            if payment_record:
-                
-                if payment_record.state == 'draft':
-                    self.env.cr.execute("""
-                        UPDATE account_move
-                        SET journal_id = %s
-                        WHERE id = %s
-                    """, (record.payment_method_id.id, payment_record.move_id.id))
-                    payment_record.action_post()  # Pastikan untuk memposting pembayaran jika masih dalam draft
-            else:
-                # Create a new payment record if it doesn't exist
-                payment_record = self.env['account.payment'].create({
-                    'partner_id': record.customer_id.id,
-                    'amount': record.payment_amount,
-                    'payment_type': 'inbound',
-                    'date': fields.Date.today(),
-                    'name': f"Payment-{record.id}",
-                    'journal_id': record.payment_method_id.id,  # Set journal if newly created
+        # Update the state and payment date
+        self.write({
+            'state': 'paid',
+            'payment_date': fields.Date.today(),
+        })
+        self._schedule_side_effect('payment')
+
+        # Kirim selisih produk yang diubah setelah booking dikonfirmasi
+        self._schedule_side_effect('stock')
+
+    @instrumented
+    def _process_payments(self):
+        """Bring the payments of the bookings in line with their state."""
+        paid = self.filtered(lambda record: record.state == 'paid')
+
+        # Confirm the invoices if they exist
+        paid.invoice_id.filtered(lambda invoice: invoice.state == 'draft').action_post()
+
+        # Payment draft yang sudah ada mengikuti metode pembayaran dan jumlah terbaru
+        to_update = defaultdict(lambda: self.env['account.payment'])
+        for record in paid.filtered(lambda record: record.payment_id.state == 'draft'):
+            payment = record.payment_id
+            changes = {}
+            if payment.journal_id != record.payment_method_id:
+                changes['journal_id'] = record.payment_method_id.id
+            if payment.amount != record.payment_amount:
+                changes['amount'] = record.payment_amount
+            if changes:
+                to_update[tuple(sorted(changes.items()))] |= payment
+        for changes, payments in to_update.items():
+            payments.write(dict(changes))
+
+        self.filtered(lambda record: record.state in ('not paid', 'paid') and not record.payment_id)._create_payments()
+        paid.payment_id.filtered(lambda payment: payment.state == 'draft').action_post()
+
+    def _schedule_side_effect(self, job_type):
+        """Run the ``job_type`` side effect of the bookings now, or queue it."""
+        if not self:
+            return
+        Job = self.env['client_clinic.job']
+        if Job._is_enabled():
+            Job._enqueue(job_type, self)
+        else:
+            getattr(self, JOB_HANDLERS[job_type])()
+
+    @instrumented
+    def _create_payments(self):
+        """Create the draft payments of the bookings in one call and link them."""
+        if not self:
+            return self.env['account.payment']
+        vals_list = []
+        for record in self:
+            vals = {
+                'partner_id': record.customer_id.id,
+                'partner_type': 'customer',
+                'amount': record.payment_amount,
+                'payment_type': 'inbound',
+                'date': fields.Date.today(),
+                'ref': f"Payment-{record.id}",
+            }
+            if record.payment_method_id:
+                vals['journal_id'] = record.payment_method_id.id
+            vals_list.append(vals)
+        payments = self.env['account.payment'].create(vals_list)
+        self._link_many2one('payment_id', payments)
+        return payments
+
+    def _link_many2one(self, fname, targets):
+        """Point ``fname`` of each booking to the matching record of ``targets``."""
+        assert self._fields[fname].type == 'many2one'
+        self.env.cr.execute(f"""
+            UPDATE client_clinic_client_clinic b
+               SET "{fname}" = v.target_id
+              FROM unnest(%s, %s) AS v(booking_id, target_id)
+             WHERE b.id = v.booking_id
+        """, [self.ids, targets.ids])
+        self.invalidate_recordset([fname])
+
+    def _get_posted_product_quantities(self):
+        """Return ``{(booking_id, product_id): quantity}`` already delivered to the customers."""
+        if not self.ids:
+            return {}
+        customer_location = self.env.ref('stock.stock_location_customers')
+        self.env['stock.move'].flush_model(['picking_id', 'product_id', 'quantity', 'state', 'location_dest_id'])
+        self.env['stock.picking'].flush_model(['client_clinic_id'])
+        self.env['client_clinic.product_line'].flush_model(['client_clinic_id', 'product_id', 'quantity_delivered_legacy'])
+        self.env.cr.execute("""
+            SELECT booking_id, product_id, SUM(quantity)
+              FROM (
+                    SELECT p.client_clinic_id AS booking_id, m.product_id,
+                           CASE WHEN m.location_dest_id = %(customer)s THEN m.quantity ELSE -m.quantity END AS quantity
+                      FROM stock_move m
+                      JOIN stock_picking p ON p.id = m.picking_id
+                     WHERE p.client_clinic_id IN %(ids)s
+                       AND m.state = 'done'
+                 UNION ALL
+                    SELECT l.client_clinic_id, l.product_id, l.quantity_delivered_legacy
+                      FROM client_clinic_product_line l
+                     WHERE l.client_clinic_id IN %(ids)s
+                       AND l.quantity_delivered_legacy != 0
+              ) posted
+          GROUP BY booking_id, product_id
+        """, {'customer': customer_location.id, 'ids': tuple(self.ids)})
+        return {(booking_id, product_id): quantity for booking_id, product_id, quantity in self.env.cr.fetchall()}
+
+    @instrumented
+    def _sync_stock_pickings(self):
+        """Post the product quantities of the bookings to stock."""
+        posted = self._get_posted_product_quantities()
+        stock_location = self.env.ref('stock.stock_location_stock')
+        customer_location = self.env.ref('stock.stock_location_customers')
+        directions = [
+            (self.env.ref('stock.picking_type_out'), stock_location, customer_location, "Pengurangan stok untuk"),
+            (self.env.ref('stock.picking_type_in'), customer_location, stock_location, "Pengembalian stok untuk"),
+        ]
+
+        picking_vals_list = []
+        for booking in self:
+            deltas = defaultdict(float)
+            if booking.state != 'cancel':
+                for line in booking.product_line_ids:
+                    deltas[line.product_id.id] += line.quantity_selected
+            for (booking_id, product_id), quantity in posted.items():
+                if booking_id == booking.id:
+                    deltas[product_id] -= quantity
+
+            for sign, (picking_type, location, location_dest, label) in zip((1, -1), directions):
+                products = self.env['product.product'].browse(
+                    [product_id for product_id, delta in deltas.items() if delta * sign > 0])
+                if not products:
+                    continue
+                picking_vals_list.append({
+                    'partner_id': booking.customer_id.id,
+                    'picking_type_id': picking_type.id,
+                    'location_id': location.id,
+                    'location_dest_id': location_dest.id,
+                    'origin': booking.name,
+                    'client_clinic_id': booking.id,
+                    'move_ids': [Command.create({
+                        'name': f"{label} {product.name}",
+                        'product_id': product.id,
+                        'product_uom_qty': deltas[product.id] * sign,
+                        'product_uom': product.uom_id.id,
+                        'location_id': location.id,
+                        'location_dest_id': location_dest.id,
+                    }) for product in products],
                 })
-                payment_record.action_post()  # Post the payment after creation
 
+        if not picking_vals_list:
+            return self.env['stock.picking']
+
+        # Konfirmasi, assign, dan validasi semua pengiriman sekaligus
+        pickings = self.env['stock.picking'].create(picking_vals_list)
+        pickings.action_confirm()
+        pickings.action_assign()
+        for move in pickings.move_ids:
+            move.quantity = move.product_uom_qty
+        pickings.move_ids.picked = True
+        pickings.with_context(skip_backorder=True, skip_sms=True).button_validate()
+        _logger.info(f"Validated stock pickings {pickings.ids} for bookings {self.ids}")
+        # Produk yang sudah terkirim tidak lagi dipesan
+        pickings.client_clinic_id._sync_reservations()
+        return pickings
+
+    def _sync_reservations(self, check=True):
+        """Reserve the product quantities of the bookings that are not delivered yet."""
+        lines = self.product_line_ids
+        if not lines:
+            return
+        posted = self._get_posted_product_quantities()
+        reserved = {}
+        for booking in self:
+            delivered = defaultdict(float)
+            for (booking_id, product_id), quantity in posted.items():
+                if booking_id == booking.id:
+                    delivered[product_id] = quantity
+            for line in booking.product_line_ids.sorted('id'):
+                if booking.state == 'cancel':
+                    reserved[line] = 0
+                    continue
+                # Kuantitas terkirim dibagikan ke baris produk yang sama sesuai urutan
+                covered = max(0, min(line.quantity_selected, delivered[line.product_id.id]))
+                delivered[line.product_id.id] -= covered
+                reserved[line] = int(line.quantity_selected - covered)
+        lines._set_reserved_quantities(reserved, check=check)
+
+    @instrumented
     def write(self, vals): 
-        # Prevent editing if the state is not 'booking' 
-        if self.state in ['paid', 'cancel']:
+        # Prevent editing if the state is not 'booking' (archiving is still allowed)
+        if set(vals) - {'active'} and any(record.state in ['paid', 'cancel'] for record in self):
             raise ValueError("Booking cannot be edited once it is completed or canceled.")
     
-        # Set Booking ID if not already set
-        if not self.name:  # If name is not present (not saved yet)
-            vals['name'] = self._get_next_booking_id()  # Set new Booking ID
-
+        # Tanggal lama dan baru sama-sama perlu dihitung ulang di rekap penjualan
+        rollup_dates = set(self.mapped('booking_date'))
         res = super(ClientClinic, self).write(vals)
+        rollup_dates.update(self.mapped('booking_date'))
+        self.env['client_clinic.sales_rollup']._mark_dates(rollup_dates)
 
         # Update calendar event if necessary
-        if 'jam_antar' in vals or 'jam_selesai' in vals:
-            _logger.info(f"Updating booking {self.id}. Updating calendar event...")
-            self._create_calendar_event()  # Update or create calendar event
+        if CALENDAR_FIELDS.intersection(vals):
+            _logger.info(f"Updating bookings {self.ids}. Syncing calendar events...")
+            self._schedule_side_effect('calendar')
 
         return res
 
     @api.model
     def _get_next_booking_id(self):
-        last_record = self.search([], order='id desc', limit=1)
-        if last_record:
-            last_id = int(last_record.name.split('_')[1])  # Get the last number
-            next_id = last_id + 1
-        else:
-            next_id = 1  # Start from 1 if no record exists
-        
-        return f"CL_{next_id:06d}"
+        return self._get_next_booking_ids(1)[0]
+
+    @api.model
+    def _get_next_booking_ids(self, count):
+        """Take ``count`` Booking IDs (CL_000001, ...) from the booking sequence."""
+        sequence = self.env.ref('pet-clinic.seq_client_clinic_booking').sudo()
+        return sequence._next_block(count)
+
+    @api.model_create_multi
+    @instrumented
+    def create(self, vals_list):
+        # Ambil satu blok Booking ID untuk semua booking baru sekaligus
+        new_vals = [vals for vals in vals_list if vals.get('name') in (None, False, 'New')]
+        for vals, name in zip(new_vals, self._get_next_booking_ids(len(new_vals))):
+            vals['name'] = name
 
-    def create(self, vals):
-        record = super(ClientClinic, self).create(vals)
-        _logger.info(f"Creating booking {record.id}. Creating calendar event...")
-        record._create_calendar_event()  # Create calendar event after record is created
-        return record
+        records = super(ClientClinic, self).create(vals_list)
+        self.env['client_clinic.sales_rollup']._mark_dates(records.mapped('booking_date'))
+        if not self.env.context.get('client_clinic_defer_side_effects'):
+            _logger.info(f"Creating bookings {records.ids}. Creating calendar events...")
+            records._schedule_side_effect('calendar')  # Create calendar events after records are created
+        return records
+
+    @api.model
+    @instrumented
+    def import_bookings(self, rows, batch_size=500):
+        """Create bookings in bulk, e.g. when migrating from another system."""
+        Booking = self.with_context(client_clinic_defer_side_effects=True)
+        created = self.browse()
+        errors = []
+        for start in range(0, len(rows), batch_size):
+            batch = [
+                (index, self._prepare_import_vals(row))
+                for index, row in enumerate(rows[start:start + batch_size], start)
+            ]
+            try:
+                with self.env.cr.savepoint():
+                    created |= Booking.create([vals for _index, vals in batch])
+                continue
+            except SerializationFailure:
+                # Transaksi diulang seluruhnya oleh server, bukan per baris
+                raise
+            except (UserError, ValueError, psycopg2.Error):
+                _logger.info("Booking import batch starting at row %s failed, retrying row by row", start)
 
+            for index, vals in batch:
+                try:
+                    with self.env.cr.savepoint():
+                        created |= Booking.create([vals])
+                except SerializationFailure:
+                    raise
+                except (UserError, ValueError, psycopg2.Error) as error:
+                    errors.append({'row': index, 'error': str(error)})
+
+        for start in range(0, len(created), batch_size):
+            created[start:start + batch_size]._sync_calendar_events()
+        _logger.info("Imported %s bookings, %s rows rejected", len(created), len(errors))
+        return {'ids': created.ids, 'errors': errors}
+
+    @api.model
+    def _prepare_import_vals(self, row):
+        vals = dict(row)
+        for fname in ('pet_service_lines', 'product_line_ids'):
+            if fname in vals:
+                vals[fname] = [
+                    Command.create(dict(line)) if isinstance(line, dict) else line
+                    for line in vals[fname]
+                ]
+        return vals
+
+    @instrumented
     def unlink(self):
-        for record in self:
-            events = self.env['calendar.event'].search([
-                ('name', '=', f"{record.worker_id.name} | {record.name}"),
-                ('start', '=', record.jam_antar),
-                ('stop', '=', record.jam_selesai)
-            ])
-            events.unlink()  # Remove found calendar events
+        self.calendar_event_id.unlink()  # Remove linked calendar events
+        self.product_line_ids._release_reservations()
+        self.env['client_clinic.sales_rollup']._mark_dates(self.mapped('booking_date'))
         return super(ClientClinic, self).unlink()
 
     @api.depends('pet_service_lines.real_time')
+    @instrumented
     def _compute_total_time(self):
         for record in self:
             record.total_time = sum(line.real_time for line in record.pet_service_lines)
 
     @api.depends('jam_antar', 'total_time')
+    @instrumented
     def _compute_jam_selesai(self):
         for record in self:
             if record.jam_antar and record.total_time:
@@ -191,6 +455,7 @@ class ClientClinic(models.Model):
                 record.jam_selesai = False
 
     @api.depends('pet_service_lines.real_price', 'product_line_ids.total_price')
+    @instrumented
     def _compute_total_price(self):
         for record in self:
             total_price = sum(line.real_price for line in record.pet_service_lines)
@@ -198,47 +463,391 @@ class ClientClinic(models.Model):
             record.total_price = total_price
 
     @api.onchange('customer_id')
+    @instrumented
     def _onchange_customer_id(self):
         if self.customer_id:
+            # Baris yang sudah diisi untuk customer ini (misalnya dari pencarian slot) dipertahankan
+            if self.pet_service_lines and all(line.pet_id.owner == self.customer_id for line in self.pet_service_lines):
+                return
             pet_domain = [('owner', '=', self.customer_id.id)]
             pets = self.env['pet_clinic.pet_clinic'].search(pet_domain)
-            self.pet_service_lines = [(5, 0, 0)]  # Clear existing lines
-            for pet in pets:
-                self.pet_service_lines |= self.env['client_clinic.line'].new({'pet_id': pet.id, 'service_id': False})
+            # Hapus baris lama dan buat semua baris baru dalam satu assignment
+            self.pet_service_lines = [Command.clear()] + [
+                Command.create({'pet_id': pet.id, 'service_id': False}) for pet in pets
+            ]
         else:
             self.pet_service_lines = [(5, 0, 0)]  # Reset if no customer
 
-    def _create_calendar_event(self):
-        if self.jam_antar and self.jam_selesai:
-            subject = f"{self.worker_id.name} | {self.name}"
-            event_values = {
-                'name': subject,
-                'start': self.jam_antar,
-                'stop': self.jam_selesai,
-                'user_id': getattr(self.worker_id, 'user_id', False),
-                'allday': False,
-            }
-            _logger.info("Creating calendar event with values: %s", event_values)
-            self.env['calendar.event'].create(event_values)
+    def _get_calendar_event_values(self):
+        self.ensure_one()
+        return {
+            'name': f"{self.worker_id.name} | {self.name}",
+            'start': self.jam_antar,
+            'stop': self.jam_selesai,
+            'user_id': getattr(self.worker_id, 'user_id', False),
+            'allday': False,
+        }
+
+    @instrumented
+    def _sync_calendar_events(self):
+        """Create, update or delete the linked calendar events of the bookings."""
+        to_create = self.browse()
+        to_update = defaultdict(lambda: self.env['calendar.event'])
+        to_delete = self.env['calendar.event']
+        for booking in self:
+            event = booking.calendar_event_id
+            if booking.state == 'cancel' or not (booking.jam_antar and booking.jam_selesai):
+                to_delete |= event
+            elif not event:
+                to_create |= booking
+            else:
+                values = booking._get_calendar_event_values()
+                changes = tuple(
+                    (fname, values[fname]) for fname in ('name', 'start', 'stop')
+                    if event[fname] != values[fname]
+                )
+                if changes:
+                    to_update[changes] |= event
+
+        if to_delete:
+            _logger.info("Deleting calendar events %s", to_delete.ids)
+            to_delete.unlink()
+        for changes, events in to_update.items():
+            _logger.info("Updating calendar events %s with values: %s", events.ids, dict(changes))
+            events.write(dict(changes))
+        if to_create:
+            events = self.env['calendar.event'].create([
+                booking._get_calendar_event_values() for booking in to_create
+            ])
+            _logger.info("Created calendar events %s", events.ids)
+            to_create._link_many2one('calendar_event_id', events)
 
     @api.constrains('booking_date', 'jam_antar', 'worker_id', 'pet_service_lines', 'customer_id')
+    @instrumented
     def _check_worker_availability(self):
         """Check if the worker is already booked at that time"""
         for booking in self:
             if not booking.pet_service_lines:
                 raise ValidationError("Silakan pilih peliharaan dan layanan sebelum menyimpan.")
-            for line in booking.pet_service_lines:
-                if line.pet_id.owner != booking.customer_id:
-                    raise ValidationError("Anda tidak dapat memesan untuk peliharaan yang bukan milik Anda.")
-            overlapping_bookings = self.env['client_clinic.client_clinic'].search([
-                ('booking_date', '=', booking.booking_date),
-                ('worker_id', '=', booking.worker_id.id),
-                ('id', '!=', booking.id),
-                ('jam_antar', '<', booking.jam_selesai),
-                ('jam_selesai', '>', booking.jam_antar)
-            ])
-            if overlapping_bookings:
-                raise ValidationError(f"Pekerja {booking.worker_id.name} sudah dipesan pada jam tersebut. Silakan pilih jam atau pekerja lain.")
+
+        # Pemilik semua peliharaan dibaca sekaligus lewat prefetch
+        if self.pet_service_lines.filtered(lambda line: line.pet_id.owner != line.client_clinic_id.customer_id):
+            raise ValidationError("Anda tidak dapat memesan untuk peliharaan yang bukan milik Anda.")
+
+        bookings = self.filtered(lambda booking: booking.state != 'cancel' and booking.jam_selesai)
+        if not bookings:
+            return
+        self.flush_model(['worker_id', 'jam_antar', 'jam_selesai', 'state', 'active'])
+        # Kondisi overlap ditulis sama dengan constraint agar index GiST-nya terpakai; booking arsip
+        # (paid/cancel yang sudah lama) dilewati, sehingga index parsial worker_id/jam_antar juga bisa dipakai.
+        # Constraint worker_no_overlap tetap menjaga semua booking, termasuk arsip.
+        self.env.cr.execute("""
+            SELECT b.id
+              FROM client_clinic_client_clinic b
+              JOIN client_clinic_client_clinic o
+                ON o.worker_id = b.worker_id
+               AND o.id != b.id
+               AND o.active
+               AND o.state != 'cancel'
+               AND o.jam_selesai IS NOT NULL
+               AND o.jam_antar < b.jam_selesai
+               AND tsrange(o.jam_antar, o.jam_selesai) && tsrange(b.jam_antar, b.jam_selesai)
+             WHERE b.id IN %s
+             LIMIT 1
+        """, [tuple(bookings.ids)])
+        row = self.env.cr.fetchone()
+        if row:
+            booking = self.browse(row[0])
+            raise ValidationError(f"Pekerja {booking.worker_id.name} sudah dipesan pada jam tersebut. Silakan pilih jam atau pekerja lain.")
+
+    @api.model
+    def _get_slot_duration(self, pets, services):
+        """Minutes needed to give every service to every pet, computed like ``real_time``."""
+        return sum(int(service.avg_time * pet.pet_type.rate) for pet in pets for service in services)
+
+    @api.model
+    def _get_worker_occupancy(self, workers, start, stop):
+        """Return ``{worker_id: [(start, stop), ...]}`` of the bookings overlapping the range."""
+        self.flush_model(['worker_id', 'jam_antar', 'jam_selesai', 'state', 'active'])
+        self.env.cr.execute("""
+            SELECT worker_id, jam_antar, jam_selesai
+              FROM client_clinic_client_clinic
+             WHERE active
+               AND worker_id = ANY(%s)
+               AND jam_antar < %s
+               AND state != 'cancel'
+               AND jam_selesai IS NOT NULL
+               AND tsrange(jam_antar, jam_selesai) && tsrange(%s, %s)
+          ORDER BY worker_id, jam_antar
+        """, [workers.ids, stop, start, stop])
+        occupancy = defaultdict(list)
+        for worker_id, busy_start, busy_stop in self.env.cr.fetchall():
+            intervals = occupancy[worker_id]
+            # Gabungkan interval yang bersinggungan agar sapuan cukup satu arah
+            if intervals and busy_start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], max(intervals[-1][1], busy_stop))
+            else:
+                intervals.append((busy_start, busy_stop))
+        return occupancy
+
+    @api.model
+    def _get_work_windows(self, date_from, date_to):
+        """Working hours of each day of the range, as naive UTC ``(start, stop)`` pairs."""
+        params = self.env['ir.config_parameter'].sudo()
+        hour_start = float(params.get_param(WORK_HOUR_START_PARAM, 8.0))
+        hour_end = float(params.get_param(WORK_HOUR_END_PARAM, 17.0))
+        tz = pytz.timezone(self.env.user.tz or 'UTC')
+
+        def to_utc(day, hours):
+            local = tz.localize(datetime.combine(day, time.min) + timedelta(hours=hours))
+            return local.astimezone(pytz.utc).replace(tzinfo=None)
+
+        windows = []
+        day = date_from
+        while day <= date_to:
+            windows.append((to_utc(day, hour_start), to_utc(day, hour_end)))
+            day += timedelta(days=1)
+        return windows
+
+    @api.model
+    @instrumented
+    def find_free_slots(self, date_from, date_to, pet_ids, service_ids, worker_ids=None, limit=5):
+        """Return the earliest free slots of each doctor for the given pets and services."""
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to) if date_to else date_from
+        pets = self.env['pet_clinic.pet_clinic'].browse(pet_ids)
+        services = self.env['service.service'].browse(service_ids)
+        duration = timedelta(minutes=self._get_slot_duration(pets, services))
+        if not duration:
+            raise UserError("Pilih peliharaan dan layanan dengan waktu layanan untuk mencari slot.")
+        workers = self.env['dokter.dokter'].browse(worker_ids) if worker_ids else self.env['dokter.dokter'].search([])
+        step = timedelta(minutes=int(self.env['ir.config_parameter'].sudo().get_param(SLOT_STEP_PARAM, 15)))
+
+        windows = self._get_work_windows(date_from, date_to)
+        if not windows or not workers:
+            return []
+        occupancy = self._get_worker_occupancy(workers, windows[0][0], windows[-1][1])
+        now = fields.Datetime.now()
+
+        def round_up(moment):
+            # Slot dimulai pada kelipatan ``step`` dihitung dari awal jam kerja
+            offset = (moment - window_start) % step
+            return moment + (step - offset) if offset else moment
+
+        result = []
+        for worker in workers:
+            busy = occupancy.get(worker.id, [])
+            slots = []
+            index = 0
+            for window_start, window_stop in windows:
+                if len(slots) >= limit:
+                    break
+                cursor = round_up(max(window_start, now))
+                # Lewati interval yang sudah selesai sebelum posisi sekarang
+                while index < len(busy) and busy[index][1] <= cursor:
+                    index += 1
+                position = index
+                while cursor + duration <= window_stop and len(slots) < limit:
+                    if position < len(busy) and busy[position][0] < cursor + duration:
+                        cursor = round_up(max(cursor, busy[position][1]))
+                        position += 1
+                        continue
+                    slots.append({'start': cursor, 'stop': cursor + duration})
+                    if position >= len(busy) or busy[position][0] >= window_stop:
+                        break
+                    cursor = round_up(busy[position][1])
+                    position += 1
+            if slots:
+                result.append({
+                    'worker_id': worker.id,
+                    'worker_name': worker.name,
+                    'duration': int(duration.total_seconds() // 60),
+                    'slots': slots,
+                })
+        result.sort(key=lambda item: (item['slots'][0]['start'], item['worker_name']))
+        return result
+
+    @api.model
+    def _cron_archive_bookings(self, batch_size=1000):
+        """Archive the paid and cancelled bookings older than the configured age."""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(ARCHIVE_AFTER_PARAM, ARCHIVE_AFTER_DEFAULT))
+        limit_date = fields.Date.today() - timedelta(days=days)
+        testing = getattr(threading.current_thread(), 'testing', False)
+        self.flush_model(['active', 'state', 'booking_date'])
+
+        total = 0
+        while True:
+            self.env.cr.execute("""
+                UPDATE client_clinic_client_clinic
+                   SET active = FALSE, write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+                 WHERE id IN (
+                        SELECT id
+                          FROM client_clinic_client_clinic
+                         WHERE active
+                           AND state IN ('paid', 'cancel')
+                           AND booking_date < %s
+                      ORDER BY id
+                         LIMIT %s
+                           FOR UPDATE SKIP LOCKED
+                 )
+             RETURNING id
+            """, [self.env.uid, limit_date, batch_size])
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            self.browse(ids).invalidate_recordset(['active', 'write_uid', 'write_date'])
+            total += len(ids)
+            if not testing:
+                self.env.cr.commit()
+            if len(ids) < batch_size:
+                break
+        _logger.info("Archived %s bookings older than %s", total, limit_date)
+        return total
+
+    @api.model
+    @instrumented
+    def get_dashboard_data(self, start_date=None, end_date=None, sections=None, limit=5, version=None):
+        """Return the data of every dashboard component in a single RPC."""
+        sections = [section for section in DASHBOARD_SECTIONS if section in set(sections or DASHBOARD_SECTIONS)]
+        start = fields.Date.to_date(start_date) if start_date else None
+        end = fields.Date.to_date(end_date) if end_date else None
+        rollup = self.env['client_clinic.sales_rollup']
+        # Perubahan di transaksi ini belum masuk ke rekap sebelum commit
+        rollup._flush_pending_dates()
+
+        # KPI juga membaca periode sebelumnya, jadi rentangnya lebih panjang
+        kpi_start = start
+        if start and end:
+            kpi_start = start - timedelta(days=max(1, (end - start).days + 1))
+        section_ranges = {
+            'chart': (start, end),
+            'kpi': (kpi_start, end),
+            'top_products': (start, end),
+        }
+        versions = {}
+        for section in sections:
+            if section_ranges[section] not in versions:
+                versions[section_ranges[section]] = rollup._get_version(*section_ranges[section])
+        result_version = "|".join(versions.values())
+        if version and version == result_version:
+            return {'version': result_version, 'unchanged': True}
+
+        dbname = self.env.cr.dbname
+        result = {'version': result_version}
+        for section in sections:
+            section_start, section_end = section_ranges[section]
+            section_version = versions[section_ranges[section]]
+            key = (section, start, end, limit if section == 'top_products' else None)
+            data = cache_get(dbname, key, section_version)
+            if data is None:
+                if section == 'chart':
+                    data = self._get_dashboard_chart_data(start, end)
+                elif section == 'kpi':
+                    data = self._get_dashboard_kpi_data(start, end)
+                else:
+                    data = self._get_dashboard_top_products(start, end, limit)
+                cache_put(dbname, key, section_start, section_end, section_version, data)
+            result[section] = data
+        return result
+
+    @api.model
+    def _get_rollup_where(self, start, end):
+        where, params = ['TRUE'], []
+        if start:
+            where.append("r.date >= %s")
+            params.append(start)
+        if end:
+            where.append("r.date <= %s")
+            params.append(end)
+        return " AND ".join(where), params
+
+    @api.model
+    def _get_dashboard_chart_data(self, start, end):
+        """Product sales per product and per day, from the rollup rows."""
+        where, params = self._get_rollup_where(start, end)
+
+        self.env.cr.execute(f"""
+            SELECT r.product_id, SUM(r.quantity), SUM(r.amount)
+              FROM client_clinic_sales_rollup r
+             WHERE r.kind = 'product' AND {where}
+          GROUP BY r.product_id
+        """, params)
+        product_rows = self.env.cr.fetchall()
+
+        self.env.cr.execute(f"""
+            SELECT r.date, SUM(r.amount)
+              FROM client_clinic_sales_rollup r
+             WHERE r.kind = 'product' AND {where}
+          GROUP BY r.date
+          ORDER BY r.date
+        """, params)
+        daily_rows = self.env.cr.fetchall()
+
+        products = self.env['product.product'].browse([row[0] for row in product_rows])
+        return {
+            'products': [{
+                'product_id': product.id,
+                'name': product.name,
+                'quantity': quantity,
+                'total': total,
+            } for product, (_pid, quantity, total) in zip(products, product_rows)],
+            'daily': [{
+                'date': fields.Date.to_string(day),
+                'total': total,
+            } for day, total in daily_rows],
+        }
+
+    @api.model
+    def _get_dashboard_kpi_data(self, start, end):
+        """Orders, revenue and products sold for the period and the one before it."""
+        if not (start and end):
+            return {
+                'current': self._get_dashboard_period_totals(start, end),
+                'previous': {'orders': 0, 'revenue': 0, 'product_sold': 0},
+            }
+        # Periode sebelumnya memiliki panjang yang sama dan berakhir sehari sebelum ``start``
+        period_days = max(1, (end - start).days + 1)
+        previous_start = start - timedelta(days=period_days)
+        previous_end = start - timedelta(days=1)
+        return {
+            'current': self._get_dashboard_period_totals(start, end),
+            'previous': self._get_dashboard_period_totals(previous_start, previous_end),
+            'previous_start': fields.Date.to_string(previous_start),
+            'previous_end': fields.Date.to_string(previous_end),
+        }
+
+    @api.model
+    def _get_dashboard_period_totals(self, start, end):
+        where, params = self._get_rollup_where(start, end)
+        self.env.cr.execute(f"""
+            SELECT COALESCE(SUM(r.booking_count) FILTER (WHERE r.kind = 'booking'), 0),
+                   COALESCE(SUM(r.amount) FILTER (WHERE r.kind = 'booking'), 0),
+                   COALESCE(SUM(r.quantity) FILTER (WHERE r.kind = 'product'), 0)
+              FROM client_clinic_sales_rollup r
+             WHERE r.kind IN ('booking', 'product') AND {where}
+        """, params)
+        orders, revenue, product_sold = self.env.cr.fetchone()
+        return {'orders': orders, 'revenue': revenue, 'product_sold': product_sold}
+
+    @api.model
+    def _get_dashboard_top_products(self, start, end, limit):
+        """Best selling products by total sales."""
+        where, params = self._get_rollup_where(start, end)
+        self.env.cr.execute(f"""
+            SELECT r.product_id, SUM(r.amount) AS total_sales, SUM(r.quantity)
+              FROM client_clinic_sales_rollup r
+             WHERE r.kind = 'product' AND {where}
+          GROUP BY r.product_id
+          ORDER BY total_sales DESC, r.product_id
+             LIMIT %s
+        """, params + [limit])
+        rows = self.env.cr.fetchall()
+
+        products = self.env['product.product'].browse([row[0] for row in rows])
+        return [{
+            'product_id': product.id,
+            'name': product.name,
+            'total_sales': total_sales,
+            'sold_stock': sold_stock,
+        } for product, (_pid, total_sales, sold_stock) in zip(products, rows)]
 
 class ClientClinicLine(models.Model):
     _name = 'client_clinic.line'
@@ -254,9 +863,28 @@ class ClientClinicLine(models.Model):
     real_time = fields.Integer(string="Waktu Real (Menit)", compute="_compute_real_time", store=True)
     rate = fields.Float(related='pet_id.pet_type.rate', string="Rate", readonly=True)
 
+    @api.model_create_multi
+    @instrumented
+    def create(self, vals_list):
+        lines = super(ClientClinicLine, self).create(vals_list)
+        self.env['client_clinic.sales_rollup']._mark_dates(lines.mapped('client_clinic_id.booking_date'))
+        return lines
+
+    @instrumented
+    def write(self, vals):
+        rollup_dates = set(self.mapped('client_clinic_id.booking_date'))
+        res = super(ClientClinicLine, self).write(vals)
+        rollup_dates.update(self.mapped('client_clinic_id.booking_date'))
+        self.env['client_clinic.sales_rollup']._mark_dates(rollup_dates)
+        return res
 
+    @instrumented
+    def unlink(self):
+        self.env['client_clinic.sales_rollup']._mark_dates(self.mapped('client_clinic_id.booking_date'))
+        return super(ClientClinicLine, self).unlink()
     
     @api.depends('service_id', 'pet_id')
+    @instrumented
     def _compute_real_price(self):
         for line in self:
             if line.pet_id and line.pet_id.pet_type:
@@ -266,7 +894,10 @@ class ClientClinicLine(models.Model):
                 line.real_price = 0.0
                 _logger.warning(f"Could not compute real price for line {line.id}. Missing pet or pet type.")
 
-    @api.depends('avg_time', 'pet_id')
+    # Seperti real_price, perubahan avg_time layanan tidak dihitung ulang di sini:
+    # hanya booking terbuka yang diperbarui, lewat _reprice_open_lines
+    @api.depends('service_id', 'pet_id')
+    @instrumented
     def _compute_real_time(self):
         for line in self:
             if line.pet_id and line.pet_id.pet_type:
@@ -276,6 +907,121 @@ class ClientClinicLine(models.Model):
                 line.real_time = 0.0
                 _logger.warning(f"Could not compute real time for line {line.id}. Missing pet or pet type.")
 
+    @api.model
+    def _get_open_lines_where(self, services=None, categories=None):
+        """SQL condition selecting the lines of open bookings using ``services`` or ``categories``."""
+        where = ["b.state IN %s"]
+        params = [OPEN_STATES]
+        targets = []
+        if services:
+            targets.append("l.service_id IN %s")
+            params.append(tuple(services.ids))
+        if categories:
+            targets.append("p.pet_type IN %s")
+            params.append(tuple(categories.ids))
+        where.append(f"({' OR '.join(targets) or 'FALSE'})")
+        return " AND ".join(where), params
+
+    @api.model
+    def _get_open_line_counts(self, services=None, categories=None):
+        """Return ``{id: count}`` of the open booking lines per service or per category."""
+        key = "l.service_id" if services else "p.pet_type"
+        where, params = self._get_open_lines_where(services, categories)
+        self.env.cr.execute(f"""
+            SELECT {key}, COUNT(l.id)
+              FROM client_clinic_line l
+              JOIN client_clinic_client_clinic b ON b.id = l.client_clinic_id
+              JOIN pet_clinic_pet_clinic p ON p.id = l.pet_id
+             WHERE {where}
+          GROUP BY {key}
+        """, params)
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    @instrumented
+    def _reprice_open_lines(self, services=None, categories=None, chunk_size=REPRICE_CHUNK_SIZE):
+        """Recompute the price and time of the open booking lines in SQL."""
+        for model in ('service.service', 'pet_category.pet_category', 'pet_clinic.pet_clinic',
+                      'client_clinic.line', 'client_clinic.product_line', 'client_clinic.client_clinic'):
+            self.env[model].flush_model()
+        where, params = self._get_open_lines_where(services, categories)
+        self.env.cr.execute(f"""
+            SELECT l.id
+              FROM client_clinic_line l
+              JOIN client_clinic_client_clinic b ON b.id = l.client_clinic_id
+              JOIN pet_clinic_pet_clinic p ON p.id = l.pet_id
+             WHERE {where}
+          ORDER BY l.id
+        """, params)
+        line_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        Booking = self.env['client_clinic.client_clinic']
+        updated = 0
+        rescheduled = Booking.browse()
+        rollup_dates = set()
+        for start in range(0, len(line_ids), chunk_size):
+            chunk = line_ids[start:start + chunk_size]
+            # Sama seperti compute ORM: nilai Integer dibulatkan ke bawah
+            self.env.cr.execute("""
+                UPDATE client_clinic_line l
+                   SET real_price = TRUNC(s.price_service * c.rate),
+                       real_time = TRUNC(COALESCE(s.avg_time, 0) * c.rate),
+                       write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+                  FROM service_service s, pet_clinic_pet_clinic p, pet_category_pet_category c
+                 WHERE l.id = ANY(%s)
+                   AND s.id = l.service_id
+                   AND p.id = l.pet_id
+                   AND c.id = p.pet_type
+                   AND (l.real_price IS DISTINCT FROM TRUNC(s.price_service * c.rate)
+                        OR l.real_time IS DISTINCT FROM TRUNC(COALESCE(s.avg_time, 0) * c.rate))
+             RETURNING l.client_clinic_id
+            """, [self.env.uid, chunk])
+            line_rows = self.env.cr.fetchall()
+            if not line_rows:
+                continue
+            updated += len(line_rows)
+            booking_ids = list({row[0] for row in line_rows})
+
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute("""
+                        WITH totals AS (
+                            SELECT b.id,
+                                   COALESCE((SELECT SUM(l.real_time) FROM client_clinic_line l
+                                              WHERE l.client_clinic_id = b.id), 0) AS total_time,
+                                   COALESCE((SELECT SUM(l.real_price) FROM client_clinic_line l
+                                              WHERE l.client_clinic_id = b.id), 0)
+                                 + COALESCE((SELECT SUM(pl.total_price) FROM client_clinic_product_line pl
+                                              WHERE pl.client_clinic_id = b.id), 0) AS total_price
+                              FROM client_clinic_client_clinic b
+                             WHERE b.id = ANY(%s)
+                        ), old AS (
+                            SELECT id, jam_selesai FROM client_clinic_client_clinic WHERE id = ANY(%s)
+                        )
+                        UPDATE client_clinic_client_clinic b
+                           SET total_time = t.total_time,
+                               total_price = t.total_price,
+                               payment_amount = t.total_price,
+                               jam_selesai = CASE WHEN b.jam_antar IS NOT NULL AND t.total_time != 0
+                                                  THEN b.jam_antar + t.total_time * INTERVAL '1 minute' END,
+                               write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+                          FROM totals t, old o
+                         WHERE t.id = b.id AND o.id = b.id
+                     RETURNING b.id, b.booking_date, b.jam_selesai IS DISTINCT FROM o.jam_selesai
+                    """, [booking_ids, booking_ids, self.env.uid])
+                    rows = self.env.cr.fetchall()
+            except psycopg2.IntegrityError:
+                raise UserError("Perubahan harga atau rate membuat jadwal dokter bertabrakan pada booking yang masih terbuka.")
+            rollup_dates.update(row[1] for row in rows)
+            rescheduled |= Booking.browse([row[0] for row in rows if row[2]])
+
+        self.invalidate_model(['real_price', 'real_time', 'write_uid', 'write_date'])
+        Booking.invalidate_model(['total_time', 'total_price', 'payment_amount', 'jam_selesai', 'write_uid', 'write_date'])
+        self.env['client_clinic.sales_rollup']._mark_dates(rollup_dates)
+        rescheduled._schedule_side_effect('calendar')
+        _logger.info("Repriced %s open booking lines", updated)
+        return updated
+
 
 
 class ClientClinicProductLine(models.Model):
@@ -288,24 +1034,53 @@ class ClientClinicProductLine(models.Model):
     product_name = fields.Char(related='product_id.name', string="Nama Produk")
     quantity = fields.Integer(string="Stok Tersedia", readonly=True, compute='_compute_quantity')
     quantity_selected = fields.Integer(string="Jumlah yang Dipilih")
+    # Jumlah yang sudah dikirim per baris oleh versi sebelum 0.7, diisi oleh migrasi
+    quantity_delivered_legacy = fields.Integer(string="Terkirim Sebelum 0.7", readonly=True, copy=False)
+    quantity_reserved = fields.Integer(string="Jumlah Dipesan", readonly=True, copy=False,
+                                       help="Stok yang ditahan baris ini sampai produk dikirim atau booking dibatalkan")
     sales_price = fields.Float(related='product_id.lst_price', string="Harga Jual", readonly=True)
     total_price = fields.Integer(string="Total Harga", compute="_compute_total_price", store=True)
 
     @api.depends('quantity_selected', 'sales_price')
+    @instrumented
     def _compute_total_price(self):
         for line in self:
             line.total_price = line.quantity_selected * line.sales_price
             _logger.debug(f"Computed total price for product line {line.id}: {line.total_price}")
 
     @api.depends('product_id')
+    @instrumented
     def _compute_quantity(self):
+        # Stok yang dipesan booking lain tidak bisa dipilih lagi
+        available = self._get_available_quantities(self.product_id)
+        reserved = self.env['client_clinic.stock_reservation']._get_reserved_quantities(self.product_id)
         for line in self:
-            if line.product_id:
-                product = line.product_id.with_context({})
-                line.quantity = product.qty_available
-                _logger.info(f"Stok tersedia untuk produk {product.name}: {product.qty_available}")
-            else:
-                line.quantity = 0
+            product_id = line.product_id.id
+            line.quantity = available.get(product_id, 0) - reserved.get(product_id, 0) + line.quantity_reserved
+
+    @api.model
+    def _get_available_quantities(self, products):
+        """Return ``{product_id: qty_available}`` for ``products``."""
+        cache = self.env.cr.precommit.data.setdefault(AVAILABLE_QTY_KEY, {})
+        missing = products.filtered(lambda product: product.id not in cache)
+        if missing:
+            missing = missing.with_context({})
+            domain_quant_loc, _domain_move_in, _domain_move_out = missing._get_domain_locations()
+            groups = self.env['stock.quant']._read_group(
+                [('product_id', 'in', missing.ids)] + domain_quant_loc,
+                ['product_id'], ['quantity:sum'],
+            )
+            cache.update(dict.fromkeys(missing.ids, 0))
+            cache.update({product.id: quantity for product, quantity in groups})
+        return {product.id: cache[product.id] for product in products}
+
+    @api.model
+    def _invalidate_available_quantities(self, products):
+        cache = self.env.cr.precommit.data.get(AVAILABLE_QTY_KEY)
+        if cache:
+            for product_id in products.ids:
+                cache.pop(product_id, None)
+        self.invalidate_model(['quantity'])
 
     @api.onchange('quantity_selected')
     def _check_quantity_available(self):
@@ -315,72 +1090,53 @@ class ClientClinicProductLine(models.Model):
             elif line.quantity_selected < 0:
                 raise ValidationError("Jumlah yang dipilih tidak boleh negatif.")
 
-    @api.model
-    def create(self, vals):
-        record = super(ClientClinicProductLine, self).create(vals)
-        if record.quantity_selected > 0:
-            # Membuat stock picking (pengiriman) tanpa 'move_lines' langsung
-            picking = self.env['stock.picking'].create({
-                'partner_id': record.client_clinic_id.customer_id.id,
-                'location_id': self.env.ref('stock.stock_location_stock').id,
-                'location_dest_id': self.env.ref('stock.stock_location_customers').id,
-                'picking_type_id': self.env.ref('stock.picking_type_out').id,
-            })
-
-            # Membuat stock move yang terkait dengan picking
-            stock_move = self.env['stock.move'].create({
-                'name': f"Pengurangan stok untuk {record.product_name}",
-                'product_id': record.product_id.id,
-                'product_uom_qty': record.quantity_selected,
-                'product_uom': record.product_id.uom_id.id,
-                'picking_id': picking.id,
-                'location_id': self.env.ref('stock.stock_location_stock').id,
-                'location_dest_id': self.env.ref('stock.stock_location_customers').id,
-            })
-
-            # Konfirmasi, assign, dan validasi pergerakan stok
-            stock_move._action_confirm()
-            stock_move._action_assign()
-            stock_move._action_done()
-
-            # Konfirmasi dan validasi picking (pengiriman)
-            picking.action_confirm()
-            picking.action_assign()
-            picking.button_validate()
-
-        return record
+    def _set_reserved_quantities(self, reserved, check=True):
+        """Set ``{line: quantity}`` as reserved quantities and update the product counters."""
+        deltas = defaultdict(int)
+        changed = {}
+        for line, quantity in reserved.items():
+            if quantity != line.quantity_reserved:
+                deltas[line.product_id.id] += quantity - line.quantity_reserved
+                changed[line.id] = quantity
+        if not changed:
+            return
+        self.env['client_clinic.stock_reservation']._apply(deltas, check=check)
+        self.env.cr.execute("""
+            UPDATE client_clinic_product_line l
+               SET quantity_reserved = v.quantity
+              FROM unnest(%s, %s) AS v(line_id, quantity)
+             WHERE l.id = v.line_id
+        """, [list(changed), list(changed.values())])
+        self.browse(changed).invalidate_recordset(['quantity_reserved', 'quantity'])
 
+    def _release_reservations(self):
+        self._set_reserved_quantities(dict.fromkeys(self, 0), check=False)
 
+    @api.model_create_multi
+    @instrumented
+    def create(self, vals_list):
+        # Stok baru dikirim saat booking dikonfirmasi, lihat ClientClinic._sync_stock_pickings
+        records = super(ClientClinicProductLine, self).create(vals_list)
+        self.env['client_clinic.sales_rollup']._mark_dates(records.mapped('client_clinic_id.booking_date'))
+        records.client_clinic_id._sync_reservations()
+        return records
+
+    @instrumented
     def write(self, vals):
+        rollup_dates = set(self.mapped('client_clinic_id.booking_date'))
+        bookings = self.client_clinic_id
+        # Reservasi produk atau booking lama dilepas sebelum dipindahkan
+        if {'product_id', 'client_clinic_id'}.intersection(vals):
+            self._release_reservations()
         res = super(ClientClinicProductLine, self).write(vals)
-        # Memperbarui stok jika ada perubahan quantity_selected
-        self._create_stock_picking()
+        rollup_dates.update(self.mapped('client_clinic_id.booking_date'))
+        self.env['client_clinic.sales_rollup']._mark_dates(rollup_dates)
+        if {'product_id', 'client_clinic_id', 'quantity_selected'}.intersection(vals):
+            (bookings | self.client_clinic_id)._sync_reservations()
         return res
 
-    def _create_stock_picking(self):
-        """Membuat stock picking dan mengurangi stok secara otomatis."""
-        picking_type = self.env.ref('stock.picking_type_out')  # Pengiriman ke pelanggan
-        for line in self:
-            if line.quantity_selected > 0:
-                picking = self.env['stock.picking'].create({
-                    'partner_id': line.client_clinic_id.customer_id.id,  # Pastikan ada partner
-                    'picking_type_id': picking_type.id,
-                    'location_id': self.env.ref('stock.stock_location_stock').id,  # Lokasi asal (gudang)
-                    'location_dest_id': self.env.ref('stock.stock_location_customers').id,  # Lokasi tujuan (pelanggan)
-                    'move_type': 'direct',
-                })
-                stock_move = self.env['stock.move'].create({
-                    'name': f"Pengurangan stok untuk {line.product_name}",
-                    'product_id': line.product_id.id,
-                    'product_uom_qty': line.quantity_selected,
-                    'product_uom': line.product_id.uom_id.id,
-                    'picking_id': picking.id,
-                    'location_id': self.env.ref('stock.stock_location_stock').id,
-                    'location_dest_id': self.env.ref('stock.stock_location_customers').id,
-                })
-                stock_move._action_confirm()
-                stock_move._action_assign()
-                stock_move._action_done()  # Validasi pergerakan stok
-                _logger.info(f"Stok produk {line.product_name} berkurang sebanyak {line.quantity_selected}")
-
-
+    @instrumented
+    def unlink(self):
+        self.env['client_clinic.sales_rollup']._mark_dates(self.mapped('client_clinic_id.booking_date'))
+        self._release_reservations()
+        return super(ClientClinicProductLine, self).unlink()
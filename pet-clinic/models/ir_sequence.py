@@ -0,0 +1,18 @@
+from odoo import models
+
+
+class IrSequence(models.Model):
+    _inherit = 'ir.sequence'
+
+    def _next_block(self, count):
+        """Reserve ``count`` numbers in one round-trip and return them formatted."""
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if self.implementation != 'standard':
+            return [self._next() for _ in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ['ir_sequence_%03d' % self.id, count],
+        )
+        return [self.get_next_char(number) for number, in self.env.cr.fetchall()]
@@ -0,0 +1,242 @@
+from odoo import models, fields, api
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import psycopg2
+import threading
+import traceback
+
+_logger = logging.getLogger(__name__)
+
+# Efek samping booking dijalankan lewat antrean jika parameter sistem ini bernilai "1"
+ASYNC_PARAM = 'pet_clinic.async_side_effects'
+# Key booking yang menunggu dimasukkan ke antrean di ``cr.precommit.data``
+PENDING_JOBS_KEY = 'client_clinic.job.pending'
+MAX_ATTEMPTS = 5
+KEEP_DONE_DAYS = 7
+# Job running yang tidak selesai dalam waktu ini dianggap ditinggalkan worker yang berhenti
+RUNNING_TIMEOUT_MINUTES = 60
+
+# Jenis job -> method booking yang dijalankan untuk seluruh batch
+JOB_HANDLERS = {
+    'calendar': '_sync_calendar_events',
+    'stock': '_sync_stock_pickings',
+    'payment': '_process_payments',
+}
+
+
+class ClientClinicJob(models.Model):
+    _name = 'client_clinic.job'
+    _description = 'Antrean Efek Samping Booking'
+    _order = 'id desc'
+    _rec_name = 'dedup_key'
+
+    job_type = fields.Selection([
+        ('calendar', 'Calendar Event'),
+        ('stock', 'Stock Picking'),
+        ('payment', 'Payment'),
+    ], string="Jenis", required=True, readonly=True)
+    booking_id = fields.Many2one('client_clinic.client_clinic', string="Booking", required=True,
+                                 readonly=True, index=True, ondelete='cascade')
+    dedup_key = fields.Char(string="Dedup Key", required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", required=True, default='pending', readonly=True)
+    attempts = fields.Integer(string="Percobaan", readonly=True)
+    eta = fields.Datetime(string="Jadwal", readonly=True, default=fields.Datetime.now)
+    date_done = fields.Datetime(string="Selesai", readonly=True)
+    last_error = fields.Text(string="Error Terakhir", readonly=True)
+
+    def init(self):
+        # Satu job pending per booking dan jenis, job baru dengan key yang sama diabaikan.
+        # Job yang sedang berjalan tidak termasuk, perubahan selama job berjalan tetap diantrekan.
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS client_clinic_job_pending_dedup_idx
+                ON client_clinic_job (dedup_key) WHERE state = 'pending'
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS client_clinic_job_pending_eta_idx
+                ON client_clinic_job (eta, id) WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _is_enabled(self):
+        return self.env['ir.config_parameter'].sudo().get_param(ASYNC_PARAM) == '1'
+
+    @api.model
+    def _enqueue(self, job_type, bookings):
+        """Queue ``job_type`` for ``bookings``; the rows are inserted right before commit."""
+        if not bookings:
+            return
+        pending = self.env.cr.precommit.data.setdefault(PENDING_JOBS_KEY, defaultdict(set))
+        if not pending:
+            self.env.cr.precommit.add(self._flush_pending_jobs)
+        pending[job_type].update(bookings.ids)
+
+    @api.model
+    def _flush_pending_jobs(self):
+        pending = self.env.cr.precommit.data.pop(PENDING_JOBS_KEY, None)
+        if not pending:
+            return
+        self.env['client_clinic.client_clinic'].flush_model()
+        for job_type, booking_ids in pending.items():
+            # Booking yang dihapus di transaksi yang sama tidak perlu diproses
+            self.env.cr.execute("""
+                INSERT INTO client_clinic_job (
+                    job_type, booking_id, dedup_key, state, attempts, eta,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT %(job_type)s, b.id, %(job_type)s || ':' || b.id, 'pending', 0, NOW() AT TIME ZONE 'UTC',
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM client_clinic_client_clinic b
+                 WHERE b.id = ANY(%(ids)s)
+                ON CONFLICT (dedup_key) WHERE state = 'pending' DO NOTHING
+            """, {'job_type': job_type, 'ids': sorted(booking_ids), 'uid': self.env.uid})
+        self.env.ref('pet-clinic.ir_cron_run_jobs').sudo()._trigger()
+        self.env.flush_all()
+
+    @api.model
+    def _cron_run_jobs(self, batch_size=100, max_batches=50):
+        """Run the pending jobs whose time has come, batch by batch."""
+        testing = getattr(threading.current_thread(), 'testing', False)
+        self._requeue_stale_jobs()
+        for _batch in range(max_batches):
+            jobs = self._claim_jobs(batch_size)
+            if not jobs:
+                break
+            if not testing:
+                self.env.cr.commit()
+            for job_type in JOB_HANDLERS:
+                jobs.filtered(lambda job: job.job_type == job_type)._run()
+            if not testing:
+                self.env.cr.commit()
+
+        self.search([
+            ('state', '=', 'done'),
+            ('date_done', '<', fields.Datetime.now() - timedelta(days=KEEP_DONE_DAYS)),
+        ]).unlink()
+
+    @api.model
+    def _claim_jobs(self, limit):
+        """Move up to ``limit`` due pending jobs to ``running`` and return them."""
+        self.env.cr.execute("""
+            UPDATE client_clinic_job
+               SET state = 'running', write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+             WHERE id IN (
+                    SELECT id
+                      FROM client_clinic_job
+                     WHERE state = 'pending' AND eta <= NOW() AT TIME ZONE 'UTC'
+                  ORDER BY eta, id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+             )
+         RETURNING id
+        """, [self.env.uid, limit])
+        jobs = self.browse(sorted(row[0] for row in self.env.cr.fetchall()))
+        jobs.invalidate_recordset(['state', 'write_uid', 'write_date'])
+        return jobs
+
+    @api.model
+    def _requeue_stale_jobs(self):
+        """Put back in the queue the running jobs left behind by a stopped worker."""
+        self.env.cr.execute("""
+            WITH stale AS (
+                SELECT id, dedup_key
+                  FROM client_clinic_job
+                 WHERE state = 'running'
+                   AND write_date < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 minute'
+                   FOR UPDATE SKIP LOCKED
+            ), requeue AS (
+                SELECT DISTINCT ON (s.dedup_key) s.id
+                  FROM stale s
+                 WHERE NOT EXISTS (
+                        SELECT 1 FROM client_clinic_job p
+                         WHERE p.dedup_key = s.dedup_key AND p.state = 'pending'
+                 )
+              ORDER BY s.dedup_key, s.id DESC
+            )
+            UPDATE client_clinic_job j
+               SET state = CASE WHEN j.id IN (SELECT id FROM requeue) THEN 'pending' ELSE 'done' END,
+                   eta = NOW() AT TIME ZONE 'UTC',
+                   date_done = CASE WHEN j.id IN (SELECT id FROM requeue) THEN NULL ELSE NOW() AT TIME ZONE 'UTC' END,
+                   last_error = 'Interrupted while running',
+                   write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+             WHERE j.id IN (SELECT id FROM stale)
+         RETURNING j.id
+        """, [RUNNING_TIMEOUT_MINUTES, self.env.uid])
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        if ids:
+            _logger.warning("Requeued jobs %s interrupted while running", ids)
+            self.browse(ids).invalidate_recordset()
+
+    def _run(self):
+        """Run jobs of a single type, falling back to one job at a time on error."""
+        if not self:
+            return
+        try:
+            with self.env.cr.savepoint():
+                self._run_handler()
+            self._mark_done()
+            return
+        except Exception:
+            _logger.info("Job batch %s failed, retrying job by job", self.ids, exc_info=True)
+
+        for job in self:
+            try:
+                with self.env.cr.savepoint():
+                    job._run_handler()
+                job._mark_done()
+            except Exception:
+                job._mark_failed(traceback.format_exc())
+
+    def _run_handler(self):
+        bookings = self.booking_id.with_context(active_test=False)
+        getattr(bookings, JOB_HANDLERS[self[0].job_type])()
+        self.env.flush_all()
+
+    def _mark_done(self):
+        self.write({'state': 'done', 'date_done': fields.Datetime.now(), 'last_error': False})
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        if attempts >= MAX_ATTEMPTS:
+            _logger.warning("Job %s failed %s times, giving up", self.dedup_key, attempts)
+            self.write({'state': 'failed', 'attempts': attempts, 'last_error': error})
+            return
+        try:
+            with self.env.cr.savepoint():
+                self.write({
+                    'state': 'pending',
+                    'attempts': attempts,
+                    'eta': fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+                    'last_error': error,
+                })
+        except psycopg2.IntegrityError:
+            # Booking ini sudah diantrekan lagi selama job berjalan, job baru itu yang mengulangnya
+            _logger.info("Job %s failed, a newer pending job replaces its retry", self.dedup_key)
+            self.write({
+                'state': 'done',
+                'attempts': attempts,
+                'date_done': fields.Datetime.now(),
+                'last_error': error,
+            })
+
+    def action_retry(self):
+        """Queue the failed jobs again, at most one pending job per dedup key."""
+        failed = self.filtered(lambda job: job.state == 'failed')
+        pending_keys = set(self.search([
+            ('state', '=', 'pending'),
+            ('dedup_key', 'in', failed.mapped('dedup_key')),
+        ]).mapped('dedup_key'))
+        to_retry = self.browse()
+        for job in failed.sorted('id', reverse=True):
+            if job.dedup_key not in pending_keys:
+                pending_keys.add(job.dedup_key)
+                to_retry |= job
+        to_retry.write({'state': 'pending', 'attempts': 0, 'eta': fields.Datetime.now()})
+        self.env.ref('pet-clinic.ir_cron_run_jobs').sudo()._trigger()
+        return True
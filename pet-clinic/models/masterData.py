@@ -6,6 +6,20 @@ class PetCategory(models.Model):
 
     name = fields.Char(string='Name', required=True)
     rate = fields.Float(string='Rate', required=True, help='Faktor waktu pengerjaan untuk kategori hewan ini')
+    open_line_count = fields.Integer(string='Baris Booking Terbuka', compute='_compute_open_line_count',
+                                     help='Jumlah baris booking terbuka yang ikut berubah jika rate diubah')
+
+    def _compute_open_line_count(self):
+        counts = self.env['client_clinic.line']._get_open_line_counts(categories=self.filtered('id'))
+        for category in self:
+            category.open_line_count = counts.get(category.id, 0)
+
+    def write(self, vals):
+        res = super(PetCategory, self).write(vals)
+        # Hanya booking terbuka yang mengikuti rate baru
+        if 'rate' in vals:
+            self.env['client_clinic.line']._reprice_open_lines(categories=self)
+        return res
 
 
 class Dokter(models.Model):
@@ -25,4 +39,18 @@ class Service(models.Model):
 
     name = fields.Char(string="Nama Layanan", required=True)
     price_service = fields.Integer(string="Harga", required=True)
-    avg_time = fields.Integer(string="Waktu Rata-rata (Menit)")
\ No newline at end of file
+    avg_time = fields.Integer(string="Waktu Rata-rata (Menit)")
+    open_line_count = fields.Integer(string="Baris Booking Terbuka", compute='_compute_open_line_count',
+                                     help="Jumlah baris booking terbuka yang ikut berubah jika harga atau waktu diubah")
+
+    def _compute_open_line_count(self):
+        counts = self.env['client_clinic.line']._get_open_line_counts(services=self.filtered('id'))
+        for service in self:
+            service.open_line_count = counts.get(service.id, 0)
+
+    def write(self, vals):
+        res = super(Service, self).write(vals)
+        # Hanya booking terbuka yang mengikuti harga dan waktu baru
+        if {'price_service', 'avg_time'}.intersection(vals):
+            self.env['client_clinic.line']._reprice_open_lines(services=self)
+        return res
\ No newline at end of file
@@ -0,0 +1,111 @@
+from odoo import models, fields, api, SUPERUSER_ID
+from collections import defaultdict, deque
+from datetime import timedelta
+import functools
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Instrumentasi aktif jika parameter sistem ini bernilai "1"
+INSTRUMENTATION_PARAM = 'pet_clinic.instrumentation'
+BUFFER_SIZE = 20000
+FLUSH_INTERVAL = 60  # detik
+
+# Ring buffer per database berisi (method, durasi dalam detik, jumlah query)
+_buffers = defaultdict(lambda: deque(maxlen=BUFFER_SIZE))
+_last_flush = defaultdict(time.monotonic)
+_lock = threading.Lock()
+
+
+def instrumented(method):
+    """Record call count, SQL queries and latency of ``method`` when enabled."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.env['ir.config_parameter'].sudo().get_param(INSTRUMENTATION_PARAM) != '1':
+            return method(self, *args, **kwargs)
+        cr = self.env.cr
+        queries = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _buffers[cr.dbname].append((
+                f"{self._name}.{method.__name__}",
+                time.perf_counter() - start,
+                cr.sql_log_count - queries,
+            ))
+            _flush_if_due(self.env)
+    return wrapper
+
+
+def _flush_if_due(env, force=False):
+    """Move the samples of the current database to the stats model."""
+    dbname = env.cr.dbname
+    with _lock:
+        if not force and time.monotonic() - _last_flush[dbname] < FLUSH_INTERVAL:
+            return
+        _last_flush[dbname] = time.monotonic()
+        samples = list(_buffers[dbname])
+        _buffers[dbname].clear()
+    if not samples:
+        return
+    try:
+        with env.registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['client_clinic.perf_stat']._record(samples)
+    except Exception:
+        _logger.warning("Could not flush %s instrumentation samples", len(samples), exc_info=True)
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ClientClinicPerfStat(models.Model):
+    _name = 'client_clinic.perf_stat'
+    _description = 'Statistik Performa Method'
+    _order = 'p95_ms desc, id desc'
+    _rec_name = 'method'
+
+    method = fields.Char(string="Method", required=True, index=True, readonly=True)
+    period_end = fields.Datetime(string="Akhir Periode", required=True, index=True, readonly=True)
+    calls = fields.Integer(string="Jumlah Panggilan", readonly=True)
+    queries = fields.Integer(string="Jumlah Query", readonly=True)
+    queries_per_call = fields.Float(string="Query per Panggilan", readonly=True, group_operator='avg')
+    total_ms = fields.Float(string="Total Waktu (ms)", readonly=True)
+    p50_ms = fields.Float(string="p50 (ms)", readonly=True, group_operator='max')
+    p95_ms = fields.Float(string="p95 (ms)", readonly=True, group_operator='max')
+    max_ms = fields.Float(string="Maks (ms)", readonly=True, group_operator='max')
+
+    @api.model
+    def _record(self, samples):
+        """Store one row per method for the given ``(method, seconds, queries)`` samples."""
+        by_method = defaultdict(list)
+        for method, duration, queries in samples:
+            by_method[method].append((duration * 1000, queries))
+
+        now = fields.Datetime.now()
+        vals_list = []
+        for method, values in by_method.items():
+            durations = sorted(duration for duration, _queries in values)
+            queries = sum(queries for _duration, queries in values)
+            vals_list.append({
+                'method': method,
+                'period_end': now,
+                'calls': len(values),
+                'queries': queries,
+                'queries_per_call': queries / len(values),
+                'total_ms': sum(durations),
+                'p50_ms': _percentile(durations, 50),
+                'p95_ms': _percentile(durations, 95),
+                'max_ms': durations[-1],
+            })
+        return self.create(vals_list)
+
+    @api.model
+    def _cron_flush(self, keep_days=30):
+        """Flush the samples of the cron worker and purge old statistics."""
+        _flush_if_due(self.env, force=True)
+        self.search([('period_end', '<', fields.Datetime.now() - timedelta(days=keep_days))]).unlink()
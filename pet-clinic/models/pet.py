@@ -1,7 +1,10 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 import logging
+import psycopg2
 
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import make_index_name
+from .perf_stats import instrumented
 _logger = logging.getLogger(__name__)
 
 
@@ -10,49 +13,73 @@ class PetClinic(models.Model):
     _description = 'Pet Clinic'
     _rec_name = 'pet_name'
 
-    pet_id = fields.Char(string="ID Peliharaan", readonly=True, unique=True)
-    pet_name = fields.Char(string="Nama Hewan", required=True)
+    pet_id = fields.Char(string="ID Peliharaan", readonly=True, unique=True, index='trigram')
+    pet_name = fields.Char(string="Nama Hewan", required=True, index='trigram')
     pet_type = fields.Many2one('pet_category.pet_category', ondelete='cascade')
     pet_age = fields.Integer(string="Umur Hewan")
-    owner = fields.Many2one('res.partner', string='Owner', required=True)
+    owner = fields.Many2one('res.partner', string='Owner', required=True, index=True)
+    pet_display_name = fields.Char(string="Nama Tampilan", compute='_compute_pet_display_name', store=True,
+                                   index='trigram')
+
+    # Pencarian many2one (autocomplete) pada nama hewan, pemilik dan ID, dibantu index trigram
+    _rec_names_search = ['pet_display_name', 'pet_id']
+
+    def _auto_init(self):
+        # Tanpa ekstensi pg_trgm, index='trigram' hanya menjadi index btree yang tidak dipakai oleh ilike
+        if not self.pool.has_trigram:
+            try:
+                with self.env.cr.savepoint(flush=False):
+                    self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                self.pool.has_trigram = True
+            except psycopg2.Error:
+                _logger.warning("Could not create the pg_trgm extension, pet search will not use trigram indexes.")
+        if self.pool.has_trigram:
+            # Index btree yang dibuat sebelum pg_trgm tersedia dibuat ulang sebagai index trigram
+            for fname in ('pet_id', 'pet_name', 'pet_display_name'):
+                indexname = make_index_name(self._table, fname)
+                self.env.cr.execute(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = %s AND indexdef NOT LIKE '%%gin_trgm_ops%%'",
+                    [indexname])
+                if self.env.cr.fetchone():
+                    self.env.cr.execute(f'DROP INDEX "{indexname}"')
+        return super(PetClinic, self)._auto_init()
+
+    @api.depends('pet_name', 'owner.name')
+    def _compute_pet_display_name(self):
+        for record in self:
+            record.pet_display_name = f"{record.pet_name} ({record.owner.name})"
+
+    @api.depends('pet_display_name')
+    def _compute_display_name(self):
+        for record in self:
+            record.display_name = record.pet_display_name
 
     @api.model
     def _get_next_pet_id(self):
-        # Cari record terakhir untuk menentukan ID berikutnya
-        last_record = self.search([], order='id desc', limit=1)
-        if last_record and last_record.pet_id:
-            try:
-                last_id = int(last_record.pet_id.split('_')[1])  # Ambil angka terakhir
-            except ValueError:
-                raise ValidationError(_("Format pet_id tidak valid pada record terakhir."))
-            next_id = last_id + 1
-        else:
-            next_id = 1  # Jika tidak ada record, mulai dari 1
-        return f"PET_{next_id:06d}"  # Format ID menjadi PET_000001, PET_000002, dst.
+        return self._get_next_pet_ids(1)[0]
 
     @api.model
-    def create(self, vals):
-        # Generate pet_id secara otomatis
-        vals['pet_id'] = self._get_next_pet_id()
+    def _get_next_pet_ids(self, count):
+        """Take ``count`` pet IDs (PET_000001, ...) from the pet sequence."""
+        sequence = self.env.ref('pet-clinic.seq_pet_clinic_pet').sudo()
+        return sequence._next_block(count)
 
-        # Pastikan pet_id tidak duplikat
-        if self.search([('pet_id', '=', vals['pet_id'])]):
-            raise ValidationError(_("Data dengan ID '%s' sudah ada.") % vals['pet_id'])
+    @api.model_create_multi
+    @instrumented
+    def create(self, vals_list):
+        # Generate pet_id secara otomatis untuk seluruh batch dalam satu langkah.
+        # Duplikasi dicegah oleh constraint unique_pet_id di database.
+        for vals, pet_id in zip(vals_list, self._get_next_pet_ids(len(vals_list))):
+            vals['pet_id'] = pet_id
 
-        return super(PetClinic, self).create(vals)
+        return super(PetClinic, self).create(vals_list)
 
+    @instrumented
     def write(self, vals):
         if 'pet_id' in vals:
             raise ValidationError(_("Anda tidak dapat mengubah ID Peliharaan secara manual."))
         return super(PetClinic, self).write(vals)
 
-    def name_get(self):
-        result = []
-        for record in self:
-            name = f"{record.pet_name} ({record.owner.name})"
-            result.append((record.id, name))
-        return result
-
     _sql_constraints = [
         ('unique_pet_id', 'unique(pet_id)', "ID Peliharaan harus unik.")
     ]
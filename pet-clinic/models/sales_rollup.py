@@ -0,0 +1,264 @@
+from odoo import models, fields, api
+from collections import OrderedDict, defaultdict
+import logging
+import threading
+from .perf_stats import instrumented
+
+_logger = logging.getLogger(__name__)
+
+# Key of the booking dates waiting for a rollup refresh in ``cr.precommit.data``
+PENDING_DATES_KEY = 'client_clinic.sales_rollup.dates'
+
+# Cache LRU per database berisi hasil query dashboard, key -> (start, end, versi, data)
+CACHE_SIZE = 256
+_cache = defaultdict(OrderedDict)
+_cache_lock = threading.Lock()
+
+
+def cache_get(dbname, key, version):
+    """Return the cached data of ``key`` if it was computed for ``version``."""
+    with _cache_lock:
+        entry = _cache[dbname].get(key)
+        if entry is None or entry[2] != version:
+            return None
+        _cache[dbname].move_to_end(key)
+        return entry[3]
+
+
+def cache_put(dbname, key, start, end, version, data):
+    """Store ``data`` computed for the rollup rows between ``start`` and ``end``."""
+    with _cache_lock:
+        entries = _cache[dbname]
+        entries[key] = (start, end, version, data)
+        entries.move_to_end(key)
+        while len(entries) > CACHE_SIZE:
+            entries.popitem(last=False)
+
+
+def cache_invalidate(dbname, dates):
+    """Drop the cached entries whose period contains one of ``dates``."""
+    with _cache_lock:
+        entries = _cache[dbname]
+        for key, (start, end, _version, _data) in list(entries.items()):
+            if any((not start or start <= date) and (not end or date <= end) for date in dates):
+                del entries[key]
+
+
+class ClientClinicSalesRollup(models.Model):
+    _name = 'client_clinic.sales_rollup'
+    _description = 'Rekap Penjualan Harian'
+    _order = 'date desc, id'
+
+    date = fields.Date(string="Tanggal Booking", required=True, index=True, readonly=True)
+    kind = fields.Selection([
+        ('booking', 'Booking'),
+        ('service', 'Layanan'),
+        ('product', 'Produk'),
+    ], string="Jenis", required=True, readonly=True)
+    worker_id = fields.Many2one('dokter.dokter', string="Dokter", readonly=True)
+    service_id = fields.Many2one('service.service', string="Layanan", readonly=True)
+    product_id = fields.Many2one('product.product', string="Produk", readonly=True)
+    booking_count = fields.Integer(string="Jumlah Booking", readonly=True)
+    quantity = fields.Integer(string="Kuantitas", readonly=True)
+    amount = fields.Integer(string="Total Harga", readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS client_clinic_sales_rollup_kind_date_idx
+                ON client_clinic_sales_rollup (kind, date)
+        """)
+        # Satu baris per tanggal, dokter, dan layanan/produk, menjadi target upsert di _refresh
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS client_clinic_sales_rollup_key_idx
+                ON client_clinic_sales_rollup (
+                    date, kind, COALESCE(worker_id, 0), COALESCE(service_id, 0), COALESCE(product_id, 0)
+                )
+        """)
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS client_clinic_sales_rollup_revision_seq")
+
+    @api.model
+    def _mark_dates(self, dates):
+        """Schedule a refresh of the rollup rows of ``dates`` before commit."""
+        dates = {date for date in dates if date}
+        if not dates:
+            return
+        pending = self.env.cr.precommit.data.setdefault(PENDING_DATES_KEY, set())
+        if not pending:
+            self.env.cr.precommit.add(self._flush_pending_dates)
+        pending.update(dates)
+
+    @api.model
+    def _flush_pending_dates(self):
+        """Refresh the dates marked in the current transaction, if any."""
+        dates = self.env.cr.precommit.data.pop(PENDING_DATES_KEY, None)
+        if dates:
+            self._refresh(dates)
+
+    @api.model
+    @instrumented
+    def _refresh(self, dates):
+        """Recompute the rollup rows of the given booking dates from the bookings."""
+        dates = sorted(dates)
+        self.env['client_clinic.client_clinic'].flush_model()
+        self.env['client_clinic.line'].flush_model()
+        self.env['client_clinic.product_line'].flush_model()
+
+        # Hanya baris yang berubah yang ditulis, transaksi lain pada tanggal yang sama tetapi dokter
+        # berbeda tidak menyentuh baris yang sama sehingga tidak saling menunggu
+        self.env.cr.execute("""
+            WITH computed AS (
+                    SELECT cc.booking_date AS date, 'booking' AS kind, cc.worker_id,
+                           NULL::int AS service_id, NULL::int AS product_id,
+                           COUNT(cc.id) AS booking_count, 0 AS quantity, COALESCE(SUM(cc.total_price), 0) AS amount
+                      FROM client_clinic_client_clinic cc
+                     WHERE cc.booking_date = ANY(%(dates)s)
+                  GROUP BY cc.booking_date, cc.worker_id
+                    UNION ALL
+                    SELECT cc.booking_date, 'service', cc.worker_id, l.service_id, NULL,
+                           COUNT(DISTINCT cc.id), COUNT(l.id), COALESCE(SUM(l.real_price), 0)
+                      FROM client_clinic_line l
+                      JOIN client_clinic_client_clinic cc ON cc.id = l.client_clinic_id
+                     WHERE cc.booking_date = ANY(%(dates)s)
+                  GROUP BY cc.booking_date, cc.worker_id, l.service_id
+                    UNION ALL
+                    SELECT cc.booking_date, 'product', cc.worker_id, NULL, pl.product_id,
+                           COUNT(DISTINCT cc.id), COALESCE(SUM(pl.quantity_selected), 0), COALESCE(SUM(pl.total_price), 0)
+                      FROM client_clinic_product_line pl
+                      JOIN client_clinic_client_clinic cc ON cc.id = pl.client_clinic_id
+                     WHERE cc.booking_date = ANY(%(dates)s)
+                  GROUP BY cc.booking_date, cc.worker_id, pl.product_id
+            ), deleted AS (
+                DELETE FROM client_clinic_sales_rollup r
+                 WHERE r.date = ANY(%(dates)s)
+                   AND NOT EXISTS (
+                        SELECT 1
+                          FROM computed c
+                         WHERE c.date = r.date AND c.kind = r.kind
+                           AND c.worker_id IS NOT DISTINCT FROM r.worker_id
+                           AND c.service_id IS NOT DISTINCT FROM r.service_id
+                           AND c.product_id IS NOT DISTINCT FROM r.product_id
+                   )
+             RETURNING r.date, r.worker_id
+            ), upserted AS (
+                INSERT INTO client_clinic_sales_rollup (
+                    date, kind, worker_id, service_id, product_id,
+                    booking_count, quantity, amount,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT c.date, c.kind, c.worker_id, c.service_id, c.product_id,
+                       c.booking_count, c.quantity, c.amount,
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM computed c
+             LEFT JOIN client_clinic_sales_rollup r
+                    ON r.date = c.date AND r.kind = c.kind
+                   AND r.worker_id IS NOT DISTINCT FROM c.worker_id
+                   AND r.service_id IS NOT DISTINCT FROM c.service_id
+                   AND r.product_id IS NOT DISTINCT FROM c.product_id
+                 WHERE r.id IS NULL
+                    OR (r.booking_count, r.quantity, r.amount) IS DISTINCT FROM (c.booking_count, c.quantity, c.amount)
+              ORDER BY c.date, c.kind, c.worker_id, c.service_id, c.product_id
+                    ON CONFLICT (date, kind, COALESCE(worker_id, 0), COALESCE(service_id, 0), COALESCE(product_id, 0))
+             DO UPDATE SET booking_count = EXCLUDED.booking_count,
+                           quantity = EXCLUDED.quantity,
+                           amount = EXCLUDED.amount,
+                           write_uid = EXCLUDED.write_uid,
+                           write_date = EXCLUDED.write_date
+             RETURNING date, worker_id
+            )
+            SELECT date, worker_id FROM deleted
+             UNION
+            SELECT date, worker_id FROM upserted
+        """, {'dates': dates, 'uid': self.env.uid})
+        keys = self.env.cr.fetchall()
+        self.invalidate_model()
+        if keys:
+            self.env['client_clinic.sales_rollup_revision']._bump(keys)
+            cache_invalidate(self.env.cr.dbname, {date for date, _worker_id in keys})
+
+    @api.model
+    def _get_version(self, start, end):
+        """Return a token that changes whenever the rows between ``start`` and ``end`` change."""
+        return self.env['client_clinic.sales_rollup_revision']._get_version(start, end)
+
+    @api.model
+    def _rebuild(self, date_from=None, date_to=None, chunk_size=100):
+        """Rebuild the rollup from scratch, optionally limited to a date range."""
+        where, params = ['TRUE'], []
+        if date_from:
+            where.append("date >= %s")
+            params.append(fields.Date.to_date(date_from))
+        if date_to:
+            where.append("date <= %s")
+            params.append(fields.Date.to_date(date_to))
+        where = " AND ".join(where)
+
+        # Tanggal yang masih ada di rekap juga ikut dihitung ulang agar baris usang terhapus
+        self.env.cr.execute(f"""
+            SELECT date FROM (
+                SELECT booking_date AS date FROM client_clinic_client_clinic
+                 UNION
+                SELECT date FROM client_clinic_sales_rollup
+            ) d
+             WHERE date IS NOT NULL AND {where}
+          ORDER BY date
+        """, params)
+        dates = [row[0] for row in self.env.cr.fetchall()]
+
+        for index in range(0, len(dates), chunk_size):
+            self._refresh(dates[index:index + chunk_size])
+        _logger.info("Rebuilt sales rollup for %s booking dates", len(dates))
+        return len(dates)
+
+
+class ClientClinicSalesRollupRevision(models.Model):
+    _name = 'client_clinic.sales_rollup_revision'
+    _description = 'Revisi Rekap Penjualan per Tanggal dan Dokter'
+    _rec_name = 'date'
+
+    date = fields.Date(string="Tanggal Booking", required=True, readonly=True)
+    worker_id = fields.Many2one('dokter.dokter', string="Dokter", readonly=True, ondelete='cascade')
+    revision = fields.Integer(string="Revisi", readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS client_clinic_sales_rollup_revision_key_idx
+                ON client_clinic_sales_rollup_revision (date, COALESCE(worker_id, 0))
+        """)
+
+    @api.model
+    def _bump(self, keys):
+        """Give each ``(date, worker_id)`` of ``keys`` a new revision from the rollup revision sequence."""
+        keys = sorted(keys, key=lambda key: (key[0], key[1] or 0))
+        self.env.cr.execute("""
+            INSERT INTO client_clinic_sales_rollup_revision (
+                date, worker_id, revision, create_uid, create_date, write_uid, write_date
+            )
+            SELECT k.date, k.worker_id, nextval('client_clinic_sales_rollup_revision_seq'),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%(dates)s::date[], %(workers)s::int[]) WITH ORDINALITY AS k(date, worker_id, seq)
+          ORDER BY k.seq
+            ON CONFLICT (date, COALESCE(worker_id, 0)) DO UPDATE
+               SET revision = EXCLUDED.revision,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {'dates': [key[0] for key in keys], 'workers': [key[1] for key in keys], 'uid': self.env.uid})
+        self.invalidate_model(['revision', 'write_uid', 'write_date'])
+
+    @api.model
+    def _get_version(self, start, end):
+        """Return a token built from the revisions of the dates between ``start`` and ``end``."""
+        where, params = ['TRUE'], []
+        if start:
+            where.append("date >= %s")
+            params.append(start)
+        if end:
+            where.append("date <= %s")
+            params.append(end)
+        # Revisi setiap tanggal dan dokter hanya bisa naik, jadi jumlahnya berubah di setiap commit,
+        # termasuk transaksi yang commit belakangan dengan revisi lebih kecil (MAX tidak berubah)
+        self.env.cr.execute(f"""
+            SELECT COALESCE(SUM(revision), 0)
+              FROM client_clinic_sales_rollup_revision
+             WHERE {" AND ".join(where)}
+        """, params)
+        return f"{start or ''}:{end or ''}:{self.env.cr.fetchone()[0]}"
@@ -0,0 +1,17 @@
+from odoo import models, fields
+
+
+class StockPicking(models.Model):
+    _inherit = 'stock.picking'
+
+    client_clinic_id = fields.Many2one('client_clinic.client_clinic', string="Booking", index=True, readonly=True, copy=False)
+
+
+class StockMove(models.Model):
+    _inherit = 'stock.move'
+
+    def _action_done(self, cancel_backorder=False):
+        moves = super(StockMove, self)._action_done(cancel_backorder=cancel_backorder)
+        # Stok tersedia di product line booking harus dibaca ulang
+        self.env['client_clinic.product_line']._invalidate_available_quantities(self.product_id)
+        return moves
@@ -0,0 +1,61 @@
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+
+class ClientClinicStockReservation(models.Model):
+    _name = 'client_clinic.stock_reservation'
+    _description = 'Stok Produk yang Dipesan Booking'
+    _rec_name = 'product_id'
+
+    product_id = fields.Many2one('product.product', string="Produk", required=True, readonly=True, ondelete='cascade')
+    quantity_reserved = fields.Integer(string="Jumlah Dipesan", readonly=True)
+
+    _sql_constraints = [
+        ('product_unique', 'unique(product_id)', "Setiap produk hanya memiliki satu baris reservasi."),
+    ]
+
+    @api.model
+    def _get_reserved_quantities(self, products):
+        """Return ``{product_id: quantity}`` reserved by the open booking lines."""
+        if not products:
+            return {}
+        self.env.cr.execute("""
+            SELECT product_id, quantity_reserved
+              FROM client_clinic_stock_reservation
+             WHERE product_id = ANY(%s)
+        """, [products.ids])
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _apply(self, deltas, check=True):
+        """Add ``{product_id: delta}`` to the reserved quantities of the products."""
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        product_ids = sorted(deltas)
+        self.env.cr.execute("""
+            INSERT INTO client_clinic_stock_reservation (
+                product_id, quantity_reserved, create_uid, create_date, write_uid, write_date
+            )
+            SELECT v.product_id, v.delta, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%(products)s::int[], %(deltas)s::int[]) AS v(product_id, delta)
+          ORDER BY v.product_id
+            ON CONFLICT (product_id) DO UPDATE
+               SET quantity_reserved = client_clinic_stock_reservation.quantity_reserved + EXCLUDED.quantity_reserved,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+         RETURNING product_id, quantity_reserved
+        """, {'uid': self.env.uid, 'products': product_ids, 'deltas': [deltas[pid] for pid in product_ids]})
+        reserved = dict(self.env.cr.fetchall())
+        self.invalidate_model(['quantity_reserved', 'write_uid', 'write_date'])
+        if not check:
+            return
+
+        products = self.env['product.product'].browse([pid for pid in product_ids if deltas[pid] > 0])
+        available = self.env['client_clinic.product_line']._get_available_quantities(products)
+        for product in products:
+            if reserved[product.id] > available[product.id]:
+                raise ValidationError(
+                    f"Stok {product.display_name} tidak cukup: tersedia {available[product.id]:g}, "
+                    f"dipesan {reserved[product.id]}."
+                )
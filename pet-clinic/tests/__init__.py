@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import test_performance, test_slot_finder, test_stock_reservation
@@ -0,0 +1,223 @@
+"""Benchmarks of the booking, stock and dashboard hot paths.
+
+They are excluded from the standard test run; launch them with::
+
+    odoo-bin -d <db> -i pet-clinic --test-tags pet_clinic_perf --stop-after-init
+
+Each benchmark fails when it issues more SQL queries than the budget
+recorded in ``perf_baseline.json``; the elapsed time is only reported, as
+wall-clock durations depend too much on the machine. Budgets are recorded
+from a real run, with a small margin, by setting ``PET_CLINIC_PERF_RECORD=1``;
+a benchmark without a recorded budget fails.
+"""
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from odoo import Command, fields
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+BASELINE_PATH = Path(__file__).parent / 'perf_baseline.json'
+BASELINE = json.loads(BASELINE_PATH.read_text())
+RECORD = os.environ.get('PET_CLINIC_PERF_RECORD') == '1'
+# Kelonggaran di atas jumlah query yang direkam: 10%, minimal 2 query
+QUERY_MARGIN = 0.1
+QUERY_MARGIN_MIN = 2
+
+
+@tagged('post_install', '-at_install', '-standard', 'pet_clinic_perf')
+class TestPetClinicPerformance(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        # Efek samping dijalankan langsung agar ikut terukur di benchmark
+        cls.env['ir.config_parameter'].sudo().set_param('pet_clinic.async_side_effects', '0')
+        cls.start = datetime.combine(fields.Date.today().replace(day=1), datetime.min.time())
+
+        cls.partners = cls.env['res.partner'].create([{'name': f"Customer {i}"} for i in range(50)])
+        cls.categories = cls.env['pet_category.pet_category'].create([
+            {'name': "Kucing", 'rate': 1.0},
+            {'name': "Anjing", 'rate': 1.5},
+        ])
+        cls.services = cls.env['service.service'].create([
+            {'name': f"Layanan {i}", 'price_service': 50000 + 10000 * i, 'avg_time': 30} for i in range(5)
+        ])
+        cls.doctors = cls.env['dokter.dokter'].create([{'name': f"Dokter {i}"} for i in range(10)])
+        cls.pets = cls.env['pet_clinic.pet_clinic'].create([{
+            'pet_name': f"Pet {i}",
+            'pet_type': cls.categories[i % 2].id,
+            'owner': cls.partners[i % 50].id,
+        } for i in range(200)])
+
+        cls.products = cls.env['product.product'].create([{
+            'name': f"Produk {i}",
+            'detailed_type': 'product',
+            'list_price': 25000,
+        } for i in range(5)])
+        stock_location = cls.env.ref('stock.stock_location_stock')
+        for product in cls.products:
+            cls.env['stock.quant']._update_available_quantity(product, stock_location, 100000)
+
+        cls.journal = cls.env['account.journal'].search([
+            ('type', 'in', ('bank', 'cash')),
+            ('company_id', '=', cls.env.company.id),
+        ], limit=1)
+
+        # 20 hari x 10 dokter, satu booking per dokter per hari
+        cls.bookings = cls.env['client_clinic.client_clinic'].create([
+            cls._booking_vals(day, index) for day in range(20) for index in range(10)
+        ])
+
+    @classmethod
+    def _booking_vals(cls, day, index, hour=9):
+        partner_index = (day * 10 + index) % 50
+        jam_antar = cls.start + timedelta(days=day, hours=hour)
+        return {
+            'customer_id': cls.partners[partner_index].id,
+            'booking_date': jam_antar.date(),
+            'jam_antar': jam_antar,
+            'worker_id': cls.doctors[index].id,
+            'payment_method_id': cls.journal.id,
+            'pet_service_lines': [Command.create({
+                'pet_id': cls.pets[partner_index].id,
+                'service_id': cls.services[index % 5].id,
+            })],
+        }
+
+    @contextmanager
+    def measure(self, name):
+        """Count the queries and the elapsed time of the block into the yielded dict."""
+        stats = {}
+        self.env.flush_all()
+        queries_before = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        yield stats
+        self.env.flush_all()
+        stats['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        stats['queries'] = self.env.cr.sql_log_count - queries_before
+        _logger.info("Benchmark %s: %s queries, %.0f ms", name, stats['queries'], stats['elapsed_ms'])
+
+    def assertQueryBudget(self, name, queries):
+        """Fail when ``queries`` exceeds the budget of ``name``; in record mode, record it instead."""
+        if RECORD:
+            margin = max(QUERY_MARGIN_MIN, math.ceil(queries * QUERY_MARGIN))
+            BASELINE[name] = {'queries': queries + margin}
+            BASELINE_PATH.write_text(json.dumps(BASELINE, indent=4, sort_keys=True) + "\n")
+            return
+        budget = BASELINE.get(name, {}).get('queries')
+        if budget is None:
+            self.fail(f"No query budget recorded for {name}, run with PET_CLINIC_PERF_RECORD=1")
+        self.assertLessEqual(queries, budget, f"{name} issued too many queries")
+
+    @contextmanager
+    def assertWithinBaseline(self, name):
+        """Fail when the block issues more queries than the budget of ``name``."""
+        with self.measure(name) as stats:
+            yield
+        self.assertQueryBudget(name, stats['queries'])
+
+    def test_booking_create(self):
+        vals_list = [self._booking_vals(day, index, hour=13) for day in range(10) for index in range(10)]
+        with self.assertWithinBaseline('booking_create_100'):
+            self.env['client_clinic.client_clinic'].create(vals_list)
+
+    def test_booking_write(self):
+        bookings = self.bookings[:100]
+        with self.assertWithinBaseline('booking_write_100'):
+            bookings.write({'description': "Kontrol ulang"})
+            for booking in bookings:
+                booking.jam_antar += timedelta(hours=6)
+
+    def test_check_worker_availability(self):
+        with self.assertWithinBaseline('check_worker_availability_200'):
+            self.bookings._check_worker_availability()
+
+    def test_onchange_customer_id(self):
+        breeder = self.env['res.partner'].create({'name': "Breeder"})
+        self.env['pet_clinic.pet_clinic'].create([{
+            'pet_name': f"Anak Anjing {i}",
+            'pet_type': self.categories[1].id,
+            'owner': breeder.id,
+        } for i in range(300)])
+        booking = self.env['client_clinic.client_clinic'].new({'customer_id': breeder.id})
+        with self.assertWithinBaseline('onchange_customer_300_pets'):
+            booking._onchange_customer_id()
+        self.assertEqual(len(booking.pet_service_lines), 300)
+
+    def test_product_line_create(self):
+        with self.assertWithinBaseline('product_line_create_200'):
+            self.env['client_clinic.product_line'].create([{
+                'client_clinic_id': booking.id,
+                'pet_id': booking.pet_service_lines.pet_id.id,
+                'product_id': self.products[index % 5].id,
+                'quantity_selected': 2,
+            } for index, booking in enumerate(self.bookings)])
+
+    def test_action_done_and_pay(self):
+        if not self.journal:
+            self.skipTest("No bank or cash journal available")
+        bookings = self.bookings[:50]
+        self.env['client_clinic.product_line'].create([{
+            'client_clinic_id': booking.id,
+            'pet_id': booking.pet_service_lines.pet_id.id,
+            'product_id': self.products[0].id,
+            'quantity_selected': 1,
+        } for booking in bookings])
+        with self.assertWithinBaseline('action_done_50'):
+            bookings.action_done()
+        with self.assertWithinBaseline('action_pay_50'):
+            bookings.action_pay()
+        self.assertTrue(all(booking.state == 'paid' for booking in bookings))
+
+    def test_dashboard_data(self):
+        self.env['client_clinic.sales_rollup']._flush_pending_dates()
+        end = (self.start + timedelta(days=27)).date()
+        with self.assertWithinBaseline('dashboard_month'):
+            data = self.env['client_clinic.client_clinic'].get_dashboard_data(self.start.date(), end)
+        self.assertEqual(data['kpi']['current']['orders'], len(self.bookings))
+
+    def test_dashboard_data_cached(self):
+        end = (self.start + timedelta(days=27)).date()
+        Booking = self.env['client_clinic.client_clinic']
+        data = Booking.get_dashboard_data(self.start.date(), end)
+        with self.assertWithinBaseline('dashboard_month_cached'):
+            unchanged = Booking.get_dashboard_data(self.start.date(), end, version=data['version'])
+        self.assertTrue(unchanged['unchanged'])
+
+    def _pet_vals(self, count, prefix):
+        return [{
+            'pet_name': f"{prefix} {i}",
+            'pet_type': self.categories[i % 2].id,
+            'owner': self.partners[i % 50].id,
+        } for i in range(count)]
+
+    def test_pet_create_batch(self):
+        Pet = self.env['pet_clinic.pet_clinic']
+        # Pembanding: satu create dan satu ID Peliharaan per hewan, seperti sebelum create batch
+        with self.measure('pet_create_10000_per_record') as per_record:
+            for vals in self._pet_vals(10000, "Pet Satuan"):
+                Pet.create(vals)
+
+        IrSequence = type(self.env['ir.sequence'])
+        with patch.object(IrSequence, '_next_block', autospec=True, side_effect=IrSequence._next_block) as next_block, \
+                self.measure('pet_create_10000') as batch:
+            pets = Pet.create(self._pet_vals(10000, "Pet Impor"))
+
+        # Seluruh batch mengambil ID Peliharaan dengan satu blok sequence
+        self.assertEqual(next_block.call_count, 1)
+        self.assertEqual(len(set(pets.mapped('pet_id'))), 10000)
+        self.assertTrue(all(pet_id.startswith('PET_') for pet_id in pets.mapped('pet_id')))
+        _logger.info("Benchmark pet_create_10000: %.1fx faster, %s instead of %s queries",
+                     per_record['elapsed_ms'] / batch['elapsed_ms'], batch['queries'], per_record['queries'])
+        self.assertLess(batch['queries'] * 10, per_record['queries'])
+        self.assertQueryBudget('pet_create_10000', batch['queries'])
@@ -0,0 +1,117 @@
+"""Free slot search across the doctors' bookings."""
+from datetime import date, datetime, timedelta
+
+from freezegun import freeze_time
+
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+
+DAY = date(2030, 1, 7)
+
+
+def utc(day_offset, hour, minute=0):
+    return datetime.combine(DAY + timedelta(days=day_offset), datetime.min.time()) + timedelta(hours=hour, minutes=minute)
+
+
+@tagged('post_install', '-at_install')
+class TestSlotFinder(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        params = cls.env['ir.config_parameter'].sudo()
+        params.set_param('pet_clinic.async_side_effects', '0')
+        params.set_param('pet_clinic.work_hour_start', '8')
+        params.set_param('pet_clinic.work_hour_end', '17')
+        params.set_param('pet_clinic.slot_step_minutes', '15')
+        # Jam kerja 08:00-17:00 WIB adalah 01:00-10:00 UTC
+        cls.env.user.tz = 'Asia/Jakarta'
+
+        customer = cls.env['res.partner'].create({'name': "Customer Slot"})
+        category = cls.env['pet_category.pet_category'].create({'name': "Kucing", 'rate': 1.0})
+        cls.pet = cls.env['pet_clinic.pet_clinic'].create({
+            'pet_name': "Milo", 'pet_type': category.id, 'owner': customer.id,
+        })
+        cls.service_30, service_50, service_20 = cls.env['service.service'].create([
+            {'name': "Periksa", 'price_service': 50000, 'avg_time': 30},
+            {'name': "Grooming", 'price_service': 80000, 'avg_time': 50},
+            {'name': "Vaksin", 'price_service': 40000, 'avg_time': 20},
+        ])
+        cls.doctor_busy, cls.doctor_free = cls.env['dokter.dokter'].create([
+            {'name': "Dokter A"},
+            {'name': "Dokter B"},
+        ])
+        # Dokter A: 01:00-01:50 dan 01:50-02:10 bersinggungan, lalu 02:45-03:35, dan 01:00-01:30 esok hari
+        cls.env['client_clinic.client_clinic'].create([{
+            'customer_id': customer.id,
+            'booking_date': jam_antar.date(),
+            'jam_antar': jam_antar,
+            'worker_id': cls.doctor_busy.id,
+            'pet_service_lines': [Command.create({'pet_id': cls.pet.id, 'service_id': service.id})],
+        } for jam_antar, service in [
+            (utc(0, 1), service_50),
+            (utc(0, 1, 50), service_20),
+            (utc(0, 2, 45), service_50),
+            (utc(1, 1), cls.service_30),
+        ]])
+
+    def _find(self, workers, limit, date_to=None):
+        return self.env['client_clinic.client_clinic'].find_free_slots(
+            DAY, date_to or DAY + timedelta(days=1), self.pet.ids, self.service_30.ids,
+            worker_ids=workers.ids, limit=limit)
+
+    def _starts(self, result):
+        return [slot['start'] for slot in result[0]['slots']]
+
+    def test_work_windows_in_user_timezone(self):
+        Booking = self.env['client_clinic.client_clinic']
+        self.assertEqual(Booking._get_work_windows(DAY, DAY + timedelta(days=1)), [
+            (utc(0, 1), utc(0, 10)),
+            (utc(1, 1), utc(1, 10)),
+        ])
+        self.env.user.tz = 'UTC'
+        self.assertEqual(Booking._get_work_windows(DAY, DAY), [(utc(0, 8), utc(0, 17))])
+
+    def test_occupancy_merges_touching_bookings(self):
+        occupancy = self.env['client_clinic.client_clinic']._get_worker_occupancy(
+            self.doctor_busy | self.doctor_free, utc(0, 1), utc(1, 10))
+        self.assertEqual(occupancy[self.doctor_busy.id], [
+            (utc(0, 1), utc(0, 2, 10)),
+            (utc(0, 2, 45), utc(0, 3, 35)),
+            (utc(1, 1), utc(1, 1, 30)),
+        ])
+        self.assertNotIn(self.doctor_free.id, occupancy)
+
+    @freeze_time('2030-01-06 12:00:00')
+    def test_slots_in_gaps_across_days(self):
+        result = self._find(self.doctor_busy, limit=3)
+        self.assertEqual(result[0]['duration'], 30)
+        # 02:10 dibulatkan ke 02:15, celah berikutnya setelah 03:35 mulai 03:45, lalu hari berikutnya
+        self.assertEqual(self._starts(result), [utc(0, 2, 15), utc(0, 3, 45), utc(1, 1, 30)])
+        self.assertEqual(result[0]['slots'][0]['stop'], utc(0, 2, 45))
+
+    @freeze_time('2030-01-06 12:00:00')
+    def test_slot_step_rounding(self):
+        self.env['ir.config_parameter'].sudo().set_param('pet_clinic.slot_step_minutes', '20')
+        # 02:10 dibulatkan ke 02:20, tetapi 02:20-02:50 menabrak booking 02:45, jadi slot pertama 03:40
+        result = self._find(self.doctor_busy, limit=1)
+        self.assertEqual(self._starts(result), [utc(0, 3, 40)])
+
+    @freeze_time('2030-01-07 03:50:00')
+    def test_now_inside_window(self):
+        result = self._find(self.doctor_busy, limit=2)
+        self.assertEqual(self._starts(result), [utc(0, 4), utc(1, 1, 30)])
+
+    @freeze_time('2030-01-06 12:00:00')
+    def test_limit_and_doctor_order(self):
+        result = self._find(self.doctor_busy | self.doctor_free, limit=1)
+        self.assertEqual([item['worker_id'] for item in result], [self.doctor_free.id, self.doctor_busy.id])
+        self.assertEqual([len(item['slots']) for item in result], [1, 1])
+        # Dokter tanpa booking bebas sejak 08:00 WIB
+        self.assertEqual(result[0]['slots'][0]['start'], utc(0, 1))
+        self.assertEqual(result[1]['slots'][0]['start'], utc(0, 2, 15))
+
+    @freeze_time('2030-01-08 12:00:00')
+    def test_no_slot_in_the_past(self):
+        self.assertEqual(self._find(self.doctor_free, limit=5, date_to=DAY + timedelta(days=1)), [])
@@ -0,0 +1,175 @@
+"""Reservation of product stock by the open booking lines."""
+from datetime import datetime, timedelta
+
+from psycopg2.errors import SerializationFailure
+
+from odoo import SUPERUSER_ID, Command, api, sql_db
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import mute_logger
+
+from ..models.client import AVAILABLE_QTY_KEY
+
+
+@tagged('post_install', '-at_install')
+class TestStockReservation(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        # Efek samping dijalankan langsung agar stok terkirim di dalam test
+        cls.env['ir.config_parameter'].sudo().set_param('pet_clinic.async_side_effects', '0')
+
+        cls.customer = cls.env['res.partner'].create({'name': "Customer Stok"})
+        category = cls.env['pet_category.pet_category'].create({'name': "Kucing", 'rate': 1.0})
+        cls.pet = cls.env['pet_clinic.pet_clinic'].create({
+            'pet_name': "Milo", 'pet_type': category.id, 'owner': cls.customer.id,
+        })
+        cls.service = cls.env['service.service'].create({'name': "Grooming", 'price_service': 50000, 'avg_time': 30})
+        cls.doctor = cls.env['dokter.dokter'].create({'name': "Dokter Stok"})
+        cls.product_a, cls.product_b = cls.env['product.product'].create([
+            {'name': "Makanan Kucing", 'detailed_type': 'product', 'list_price': 25000},
+            {'name': "Vitamin Kucing", 'detailed_type': 'product', 'list_price': 15000},
+        ])
+        stock_location = cls.env.ref('stock.stock_location_stock')
+        for product in (cls.product_a, cls.product_b):
+            cls.env['stock.quant']._update_available_quantity(product, stock_location, 5)
+
+        start = datetime(2030, 1, 7, 2, 0)
+        cls.booking_1, cls.booking_2 = cls.env['client_clinic.client_clinic'].create([{
+            'customer_id': cls.customer.id,
+            'booking_date': (start + timedelta(hours=hours)).date(),
+            'jam_antar': start + timedelta(hours=hours),
+            'worker_id': cls.doctor.id,
+            'pet_service_lines': [Command.create({'pet_id': cls.pet.id, 'service_id': cls.service.id})],
+        } for hours in (0, 2)])
+
+    def setUp(self):
+        super().setUp()
+        # Stok tersedia di-cache per transaksi, savepoint test sebelumnya bisa meninggalkan nilai lama
+        self.env.cr.precommit.data.pop(AVAILABLE_QTY_KEY, None)
+
+    def _add_line(self, booking, product, quantity):
+        return self.env['client_clinic.product_line'].create({
+            'client_clinic_id': booking.id,
+            'pet_id': self.pet.id,
+            'product_id': product.id,
+            'quantity_selected': quantity,
+        })
+
+    def _reserved(self, product):
+        return self.env['client_clinic.stock_reservation']._get_reserved_quantities(product).get(product.id, 0)
+
+    def test_reserve_on_create(self):
+        line = self._add_line(self.booking_1, self.product_a, 3)
+        self.assertEqual(line.quantity_reserved, 3)
+        self.assertEqual(self._reserved(self.product_a), 3)
+        # Stok yang dipesan booking lain tidak bisa dipilih lagi
+        self.assertEqual(self._add_line(self.booking_2, self.product_a, 1).quantity, 2)
+
+    def test_reserve_beyond_stock(self):
+        with self.assertRaises(ValidationError), self.env.cr.savepoint():
+            self._add_line(self.booking_1, self.product_a, 6)
+        self._add_line(self.booking_1, self.product_a, 3)
+        with self.assertRaises(ValidationError), self.env.cr.savepoint():
+            self._add_line(self.booking_2, self.product_a, 3)
+        self.assertEqual(self._reserved(self.product_a), 3)
+
+    def test_release_on_cancel(self):
+        line = self._add_line(self.booking_1, self.product_a, 4)
+        self.booking_1.action_cancel()
+        self.assertEqual(line.quantity_reserved, 0)
+        self.assertEqual(self._reserved(self.product_a), 0)
+        self._add_line(self.booking_2, self.product_a, 5)
+        self.assertEqual(self._reserved(self.product_a), 5)
+
+    def test_release_after_delivery(self):
+        line = self._add_line(self.booking_1, self.product_a, 3)
+        pickings = self.booking_1._sync_stock_pickings()
+        self.assertEqual(pickings.state, 'done')
+        self.assertEqual(line.quantity_reserved, 0)
+        self.assertEqual(self._reserved(self.product_a), 0)
+        self.assertEqual(self.product_a.qty_available, 2)
+
+        # Hanya tambahan setelah pengiriman yang dipesan
+        line.quantity_selected = 4
+        self.assertEqual(line.quantity_reserved, 1)
+        self.assertEqual(self._reserved(self.product_a), 1)
+
+    def test_legacy_delivered_lines(self):
+        # Baris dari versi sebelum 0.7 sudah terkirim lewat picking tanpa booking
+        line = self._add_line(self.booking_1, self.product_a, 3)
+        line.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE client_clinic_product_line SET quantity_delivered_legacy = 3 WHERE id = %s", [line.id])
+        line.invalidate_recordset(['quantity_delivered_legacy'])
+        self.booking_1._sync_reservations()
+        self.assertEqual(line.quantity_reserved, 0)
+        self.assertFalse(self.booking_1._sync_stock_pickings())
+
+    def test_change_quantity_and_product(self):
+        line = self._add_line(self.booking_1, self.product_a, 3)
+        line.quantity_selected = 1
+        self.assertEqual(self._reserved(self.product_a), 1)
+
+        line.product_id = self.product_b
+        self.assertEqual(self._reserved(self.product_a), 0)
+        self.assertEqual(self._reserved(self.product_b), 1)
+        self.assertEqual(line.quantity_reserved, 1)
+
+    def test_move_line_between_bookings(self):
+        line = self._add_line(self.booking_1, self.product_a, 2)
+        self.booking_2.action_cancel()
+        line.client_clinic_id = self.booking_2
+        # Booking tujuan dibatalkan, jadi baris tidak lagi memesan stok
+        self.assertEqual(line.quantity_reserved, 0)
+        self.assertEqual(self._reserved(self.product_a), 0)
+
+        line.client_clinic_id = self.booking_1
+        self.assertEqual(line.quantity_reserved, 2)
+        self.assertEqual(self._reserved(self.product_a), 2)
+
+    def test_release_on_unlink(self):
+        line_1 = self._add_line(self.booking_1, self.product_a, 2)
+        self._add_line(self.booking_2, self.product_a, 1)
+        line_1.unlink()
+        self.assertEqual(self._reserved(self.product_a), 1)
+        self.booking_2.unlink()
+        self.assertEqual(self._reserved(self.product_a), 0)
+
+
+@tagged('post_install', '-at_install')
+class TestStockReservationConcurrency(TransactionCase):
+    """Two transactions reserving the same product, through cursors of their own."""
+
+    def test_concurrent_reservations_serialize(self):
+        db = sql_db.db_connect(self.env.cr.dbname)
+        with db.cursor() as cr:
+            product = api.Environment(cr, SUPERUSER_ID, {})['product.product'].create({
+                'name': "Produk Konkuren", 'detailed_type': 'product',
+            })
+            product_id = product.id
+        try:
+            with db.cursor() as cr_1, db.cursor() as cr_2:
+                reservation_1 = api.Environment(cr_1, SUPERUSER_ID, {})['client_clinic.stock_reservation']
+                reservation_2 = api.Environment(cr_2, SUPERUSER_ID, {})['client_clinic.stock_reservation']
+                # Snapshot kedua transaksi diambil sebelum salah satunya commit
+                self.assertEqual(reservation_1._get_reserved_quantities(product.with_env(reservation_1.env)), {})
+                self.assertEqual(reservation_2._get_reserved_quantities(product.with_env(reservation_2.env)), {})
+
+                reservation_1._apply({product_id: 1}, check=False)
+                cr_1.commit()
+                with self.assertRaises(SerializationFailure), mute_logger('odoo.sql_db'):
+                    reservation_2._apply({product_id: 2}, check=False)
+                cr_2.rollback()
+
+                # Diulang seperti oleh server, transaksi kedua melihat total yang baru
+                reservation_2._apply({product_id: 2}, check=False)
+                self.assertEqual(reservation_2._get_reserved_quantities(product.with_env(reservation_2.env)),
+                                 {product_id: 3})
+                cr_2.rollback()
+        finally:
+            with db.cursor() as cr:
+                cr.execute("DELETE FROM client_clinic_stock_reservation WHERE product_id = %s", [product_id])
+                api.Environment(cr, SUPERUSER_ID, {})['product.product'].browse(product_id).product_tmpl_id.unlink()
@@ -0,0 +1,79 @@
+from odoo import models, fields, api, Command
+from datetime import timedelta
+
+
+class ClientClinicSlotFinder(models.TransientModel):
+    _name = 'client_clinic.slot_finder'
+    _description = 'Cari Slot Kosong Dokter'
+
+    date_from = fields.Date(string="Dari Tanggal", required=True, default=fields.Date.context_today)
+    date_to = fields.Date(string="Sampai Tanggal", required=True,
+                          default=lambda self: fields.Date.context_today(self) + timedelta(days=6))
+    customer_id = fields.Many2one('res.partner', string="Customer", required=True)
+    pet_ids = fields.Many2many('pet_clinic.pet_clinic', string="Peliharaan", required=True,
+                               domain="[('owner', '=', customer_id)]")
+    service_ids = fields.Many2many('service.service', string="Layanan", required=True)
+    worker_id = fields.Many2one('dokter.dokter', string="Dokter", help="Kosongkan untuk mencari di semua dokter")
+    duration = fields.Integer(string="Durasi (Menit)", compute='_compute_duration')
+    line_ids = fields.One2many('client_clinic.slot_finder.line', 'wizard_id', string="Slot Kosong", readonly=True)
+
+    @api.depends('pet_ids', 'service_ids')
+    def _compute_duration(self):
+        Booking = self.env['client_clinic.client_clinic']
+        for wizard in self:
+            wizard.duration = Booking._get_slot_duration(wizard.pet_ids, wizard.service_ids)
+
+    @api.onchange('customer_id')
+    def _onchange_customer_id(self):
+        self.pet_ids = self.pet_ids.filtered(lambda pet: pet.owner == self.customer_id)
+
+    def action_search(self):
+        self.ensure_one()
+        results = self.env['client_clinic.client_clinic'].find_free_slots(
+            self.date_from, self.date_to, self.pet_ids.ids, self.service_ids.ids,
+            worker_ids=self.worker_id.ids or None,
+        )
+        self.line_ids = [Command.clear()] + [
+            Command.create({'worker_id': item['worker_id'], 'start': slot['start'], 'stop': slot['stop']})
+            for item in results for slot in item['slots']
+        ]
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+
+class ClientClinicSlotFinderLine(models.TransientModel):
+    _name = 'client_clinic.slot_finder.line'
+    _description = 'Slot Kosong Dokter'
+    _order = 'start, worker_id'
+
+    wizard_id = fields.Many2one('client_clinic.slot_finder', required=True, ondelete='cascade')
+    worker_id = fields.Many2one('dokter.dokter', string="Dokter", readonly=True)
+    start = fields.Datetime(string="Mulai", readonly=True)
+    stop = fields.Datetime(string="Selesai", readonly=True)
+
+    def action_book(self):
+        """Open a new booking prefilled with this slot, the customer, pets and services."""
+        self.ensure_one()
+        wizard = self.wizard_id
+        lines = [
+            Command.create({'pet_id': pet.id, 'service_id': service.id})
+            for pet in wizard.pet_ids for service in wizard.service_ids
+        ]
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'client_clinic.client_clinic',
+            'view_mode': 'form',
+            'target': 'current',
+            'context': {
+                'default_customer_id': wizard.customer_id.id,
+                'default_worker_id': self.worker_id.id,
+                'default_jam_antar': fields.Datetime.to_string(self.start),
+                'default_booking_date': fields.Date.to_string(fields.Datetime.context_timestamp(self, self.start).date()),
+                'default_pet_service_lines': lines,
+            },
+        }
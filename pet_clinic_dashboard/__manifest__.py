@@ -6,7 +6,7 @@
     'sequence': -1,
     'description': """Clinic Custom Dashboard""",
     'category': 'extra',
-    'depends' : ['base', 'web', 'pet-clinic'],
+    'depends' : ['base', 'web', 'bus', 'pet-clinic'],
     'data': [
         'views/sales_dashboard.xml',
     ],
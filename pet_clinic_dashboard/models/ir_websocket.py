@@ -0,0 +1,14 @@
+from odoo import models
+
+from .sales_rollup import DASHBOARD_GROUP
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # Perubahan rekap penjualan dikirim ke channel grup, bukan channel teks yang bisa diikuti siapa saja
+        if self.env.uid and self.env.user.has_group(DASHBOARD_GROUP):
+            channels = list(channels)
+            channels.append(self.env.ref(DASHBOARD_GROUP))
+        return super(IrWebsocket, self)._build_bus_channel_list(channels)
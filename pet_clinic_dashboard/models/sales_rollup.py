@@ -0,0 +1,54 @@
+from odoo import models, fields, api
+
+# Grup yang menerima perubahan rekap penjualan: user yang boleh membaca booking
+DASHBOARD_GROUP = 'base.group_user'
+DELTA_NOTIFICATION = 'pet_clinic_dashboard/rollup_delta'
+
+
+class ClientClinicSalesRollup(models.Model):
+    _inherit = 'client_clinic.sales_rollup'
+
+    @api.model
+    def _get_dashboard_totals(self, dates):
+        """Return ``{(date, kind, worker_id, product_id): (orders, quantity, amount)}`` for ``dates``."""
+        self.env.cr.execute("""
+            SELECT date, kind, worker_id, product_id,
+                   SUM(booking_count), SUM(quantity), SUM(amount)
+              FROM client_clinic_sales_rollup
+             WHERE date = ANY(%s) AND kind IN ('booking', 'product')
+          GROUP BY date, kind, worker_id, product_id
+        """, [list(dates)])
+        return {tuple(row[:4]): row[4:] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _refresh(self, dates):
+        """Publish the changes of the refreshed dates to the open dashboards."""
+        dates = sorted(dates)
+        before = self._get_dashboard_totals(dates)
+        res = super(ClientClinicSalesRollup, self)._refresh(dates)
+        after = self._get_dashboard_totals(dates)
+
+        deltas = []
+        for key in before.keys() | after.keys():
+            old, new = before.get(key, (0, 0, 0)), after.get(key, (0, 0, 0))
+            orders, quantity, amount = (n - o for n, o in zip(new, old))
+            if orders or quantity or amount:
+                date, kind, worker_id, product_id = key
+                deltas.append({
+                    'date': fields.Date.to_string(date),
+                    'kind': kind,
+                    'worker_id': worker_id,
+                    'product_id': product_id,
+                    'orders': orders,
+                    'quantity': quantity,
+                    'amount': amount,
+                })
+        if deltas:
+            product_ids = {delta['product_id'] for delta in deltas if delta['product_id']}
+            names = {product.id: product.name for product in self.env['product.product'].sudo().browse(product_ids)}
+            for delta in deltas:
+                if delta['product_id']:
+                    delta['name'] = names.get(delta['product_id'], '')
+            # Channel berupa record grup, hanya anggota grup yang didaftarkan ke channel ini
+            self.env['bus.bus']._sendone(self.env.ref(DASHBOARD_GROUP), DELTA_NOTIFICATION, {'deltas': deltas})
+        return res
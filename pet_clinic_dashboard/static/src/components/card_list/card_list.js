@@ -4,12 +4,18 @@
 
 /** @odoo-module **/
 
-import { Component, onWillStart } from "@odoo/owl";
+import { Component, onWillStart, onMounted, onWillUnmount } from "@odoo/owl";
 import { useService } from "@web/core/utils/hooks";
+import { DELTA_NOTIFICATION } from "../dashboard_channel";
+
+const TOP_PRODUCTS_LIMIT = 5;
 
 export class ProductCardList extends Component {
     setup() {
         this.orm = useService('orm');
+        this.busService = useService('bus_service');
+        this.onRollupDelta = (payload) => this.applyDeltas(payload.deltas);
+        this.topProducts = [];
         this.state = {
             products: [],
         };
@@ -17,52 +23,84 @@ export class ProductCardList extends Component {
         onWillStart(async () => {
             await this.fetchTopSellingProducts();
         });
+
+        onMounted(() => {
+            this.busService.subscribe(DELTA_NOTIFICATION, this.onRollupDelta);
+        });
+
+        onWillUnmount(() => {
+            this.busService.unsubscribe(DELTA_NOTIFICATION, this.onRollupDelta);
+        });
     }
 
     async fetchTopSellingProducts() {
         try {
-            // Mengambil data dari model client_clinic.product_line
-            const productData = await this.orm.call(
-                'client_clinic.product_line', // Model
-                'search_read',               // Method
-                [[], ['product_name', 'total_price', 'quantity_selected']],  // Fields yang dibutuhkan
-                { order: 'product_name asc' }  // Mengurutkan berdasarkan nama produk
+            // Pengelompokan dan pengurutan produk dilakukan di server
+            const dashboardData = await this.orm.call(
+                'client_clinic.client_clinic',  // Model
+                'get_dashboard_data',          // Method
+                [null, null],                  // Tanpa filter tanggal
+                { sections: ['top_products'], limit: TOP_PRODUCTS_LIMIT }  // Top 5 produk teratas
             );
 
-            // Mengelompokkan produk berdasarkan 'product_name'
-            const groupedProducts = productData.reduce((acc, product) => {
-                if (!acc[product.product_name]) {
-                    // Jika produk dengan nama ini belum ada, inisialisasi
-                    acc[product.product_name] = {
-                        name: product.product_name,
-                        totalSales: 0,
-                        soldStock: 0,
-                    };
-                }
-                // Menambahkan nilai 'total_price' dan 'quantity_selected' ke produk yang dikelompokkan
-                acc[product.product_name].totalSales += product.total_price;
-                acc[product.product_name].soldStock += product.quantity_selected;
-                return acc;
-            }, {});
-
-            // Mengonversi object hasil reduce menjadi array dan mengurutkan berdasarkan 'totalSales'
-            const groupedProductArray = Object.values(groupedProducts).map((product, index) => ({
-                number: index + 1,  // Menambahkan nomor item
-                name: product.name,  // Nama produk
-                totalSales: this.formatCurrency(product.totalSales),  // Format total penjualan
-                soldStock: product.soldStock  // Kuantitas terjual
-            }));
-
-            // Mengambil top 5 produk dengan penjualan tertinggi
-            this.state.products = groupedProductArray
-                .sort((a, b) => b.totalSales - a.totalSales)
-                .slice(0, 5);  // Batasi ke 5 produk teratas
+            this.topProducts = dashboardData.top_products;
+            this.setProducts();
 
         } catch (error) {
             console.error("Error fetching product data:", error);
         }
     }
 
+    setProducts() {
+        this.state.products = this.topProducts.map((product, index) => ({
+            number: index + 1,  // Menambahkan nomor item
+            name: product.name,  // Nama produk
+            totalSales: this.formatCurrency(product.total_sales),  // Format total penjualan
+            soldStock: product.sold_stock  // Kuantitas terjual
+        }));
+    }
+
+    async applyDeltas(deltas) {
+        // Daftar lengkap berarti produk lain bisa menyalip, hanya saat itu data diambil ulang
+        const isFull = this.topProducts.length >= TOP_PRODUCTS_LIMIT;
+        let changed = false;
+        let refetch = false;
+        for (const delta of deltas) {
+            if (delta.kind !== 'product' || !delta.amount) {
+                continue;
+            }
+            const product = this.topProducts.find(row => row.product_id === delta.product_id);
+            if (product) {
+                product.total_sales += delta.amount;
+                product.sold_stock += delta.quantity;
+                refetch = refetch || (isFull && delta.amount < 0);
+            } else if (!isFull) {
+                this.topProducts.push({
+                    product_id: delta.product_id,
+                    name: delta.name,
+                    total_sales: delta.amount,
+                    sold_stock: delta.quantity,
+                });
+            } else {
+                refetch = refetch || delta.amount > 0;
+            }
+            changed = true;
+        }
+
+        if (refetch) {
+            await this.fetchTopSellingProducts();
+        } else if (changed) {
+            this.topProducts = this.topProducts
+                .filter(row => row.total_sales > 0)
+                .sort((a, b) => b.total_sales - a.total_sales || a.product_id - b.product_id)
+                .slice(0, TOP_PRODUCTS_LIMIT);
+            this.setProducts();
+        } else {
+            return;
+        }
+        this.render();
+    }
+
     // Format currency dengan "Rp" dan pemisah ribuan
     formatCurrency(amount) {
         return 'Rp ' + amount.toLocaleString('id-ID');
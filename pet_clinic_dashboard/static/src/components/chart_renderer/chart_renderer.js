@@ -3,20 +3,24 @@
 /** @odoo-module */
 import { registry } from "@web/core/registry";
 import { loadJS } from "@web/core/assets";
-const { Component, onWillStart, useRef, onMounted } = owl;
+const { Component, onWillStart, useRef, onMounted, onWillUnmount } = owl;
 import { useService } from "@web/core/utils/hooks";
+import { DELTA_NOTIFICATION } from "../dashboard_channel";
 
 export class ChartRenderer extends Component {
   setup() {
     this.chartRef = useRef("chart");
     this.orm = useService('orm');
     this.actionService = useService("action");
+    this.busService = useService("bus_service");
+    this.onRollupDelta = (payload) => this.applyDeltas(payload.deltas);
+    this.chartData = null;
 
     // Debug logs to check if services are initialized
     console.log('ORM Service:', this.orm);
     console.log('Action Service:', this.actionService);
 
-    this.state = { labels: [], datasets: [] };
+    this.state = { labels: [], datasets: [], startDate: null, endDate: null, version: null };
     this.handleChartClick = this.handleChartClick.bind(this);
 
     onWillStart(async () => {
@@ -33,50 +37,72 @@ export class ChartRenderer extends Component {
     onMounted(() => {
       this.renderChart();
       this.attachEventListeners();
+      this.busService.subscribe(DELTA_NOTIFICATION, this.onRollupDelta);
+    });
+
+    onWillUnmount(() => {
+      this.busService.unsubscribe(DELTA_NOTIFICATION, this.onRollupDelta);
     });
   }
 
 
 
   async fetchAndProcessData(startDate = null, endDate = null) {
-    const domain = startDate && endDate ? [['jam_antar', '>=', startDate], ['jam_antar', '<=', endDate]] : [];
-
     try {
-      const clientData = await this.orm.call('client_clinic.client_clinic', 'search_read', [
-        domain, ['id', 'name', 'jam_antar', 'product_line_ids']
-      ]);
-      const saleData = await this.extractSaleData(clientData);
-      await this.processData(saleData);
+      // Semua agregasi dilakukan di server dalam satu panggilan
+      const dashboardData = await this.orm.call('client_clinic.client_clinic', 'get_dashboard_data',
+        [startDate, endDate], { sections: ['chart'], version: this.state.version });
+      // Data di server tidak berubah sejak pemanggilan terakhir, tidak perlu render ulang
+      if (dashboardData.unchanged) {
+        return;
+      }
+      this.state.version = dashboardData.version;
+      this.state.startDate = startDate;
+      this.state.endDate = endDate;
+      this.chartData = dashboardData.chart;
+      await this.processData(this.groupData(this.chartData));
     } catch (error) {
       console.error('Error fetching data:', error);
     }
   }
 
-  async extractSaleData(clientData) {
-    const saleDataPromises = clientData.map(async client => {
-      if (client.product_line_ids) {
-        const productLines = await this.orm.call('client_clinic.product_line', 'search_read', [
-          [['id', 'in', client.product_line_ids]],
-          ['product_name', 'client_clinic_id', 'quantity', 'quantity_selected', 'total_price']
-        ]);
-        return productLines.map(line => ({
-          jam_antar: client.jam_antar,
-          name: line.product_name,
-          qty_to_invoice: line.quantity_selected,
-          price_total: line.total_price,
-          client_clinic_id: client.id
-        }));
+  applyDeltas(deltas) {
+    // Tambahkan perubahan penjualan produk ke data chart tanpa query ulang
+    if (!this.chartData) {
+      return;
+    }
+    const { startDate, endDate } = this.state;
+    let changed = false;
+    for (const delta of deltas) {
+      if (delta.kind !== 'product' || (startDate && delta.date < startDate) || (endDate && delta.date > endDate)) {
+        continue;
       }
-      return [];
-    });
-
-    const saleData = (await Promise.all(saleDataPromises)).flat();
-    console.log('Sale Data:', saleData); // Check extracted sale data
-    return saleData;
+      let product = this.chartData.products.find(row => row.product_id === delta.product_id);
+      if (!product) {
+        product = { product_id: delta.product_id, name: delta.name, quantity: 0, total: 0 };
+        this.chartData.products.push(product);
+      }
+      product.quantity += delta.quantity;
+      product.total += delta.amount;
+
+      let day = this.chartData.daily.find(row => row.date === delta.date);
+      if (!day) {
+        day = { date: delta.date, total: 0 };
+        this.chartData.daily.push(day);
+        this.chartData.daily.sort((a, b) => a.date.localeCompare(b.date));
+      }
+      day.total += delta.amount;
+      changed = true;
+    }
+    if (changed) {
+      this.chartData.products = this.chartData.products.filter(row => row.quantity || row.total);
+      // Token versi tidak lagi sesuai dengan data yang ditampilkan
+      this.state.version = null;
+      this.processData(this.groupData(this.chartData));
+    }
   }
 
-  async processData(saleData) {
-    const groupedData = this.groupData(saleData);
+  async processData(groupedData) {
     const labels = Object.keys(groupedData);
 
     // Data agregat
@@ -95,7 +121,7 @@ export class ChartRenderer extends Component {
         borderColor: sortedData.map((_, index) => this.getDiverseGradientColor(index, sortedData.length)),
         borderWidth: 3,
         hoverOffset: 4,
-        client_clinic_ids: sortedData.map(item => groupedData[item.label].client_clinic_ids)
+        product_ids: sortedData.map(item => groupedData[item.label].product_ids)
       }];
     } else {
       this.state.labels = labels;
@@ -106,7 +132,7 @@ export class ChartRenderer extends Component {
         borderColor: labels.map((_, index) => this.getDiverseGradientColor(index, labels.length)),
         borderWidth: 3,
         hoverOffset: 4,
-        client_clinic_ids: labels.map(label => groupedData[label].client_clinic_ids)
+        product_ids: labels.map(label => groupedData[label].product_ids)
       }];
     }
 
@@ -114,33 +140,27 @@ export class ChartRenderer extends Component {
   }
 
 
-  groupData(saleData) {
-    return saleData.reduce((acc, order) => {
-      // Tentukan key berdasarkan tipe chart
-      let key;
-      if (this.props.type === 'line') {
-        const jamAntar = new Date(order.jam_antar);
-        key = new Date(jamAntar.getTime() - jamAntar.getTimezoneOffset() * 60000)
-          .toISOString()
-          .split('T')[0]; // Grup berdasarkan tanggal untuk line chart
-      } else {
-        key = order.name; // Grup berdasarkan nama untuk chart lain
-      }
+  groupData(chartData) {
+    // Line chart memakai seri per tanggal, chart lain memakai seri per produk
+    const series = this.props.type === 'line' ? chartData.daily : chartData.products;
+
+    return series.reduce((acc, row) => {
+      const key = this.props.type === 'line' ? row.date : row.name;
 
       // Inisialisasi grup jika belum ada
       if (!acc[key]) {
-        acc[key] = { total: 0, client_clinic_ids: [] };
+        acc[key] = { total: 0, product_ids: [] };
       }
 
-      // Tambahkan client_clinic_id ke array jika belum ada
-      if (!acc[key].client_clinic_ids.includes(order.client_clinic_id)) {
-        acc[key].client_clinic_ids.push(order.client_clinic_id);
+      // Simpan product_id (produk berbeda bisa memiliki nama yang sama)
+      if (row.product_id && !acc[key].product_ids.includes(row.product_id)) {
+        acc[key].product_ids.push(row.product_id);
       }
 
       // Agregasi berdasarkan tipe chart
       acc[key].total += this.props.type === 'doughnut'
-        ? order.qty_to_invoice
-        : order.price_total;
+        ? row.quantity
+        : row.total;
 
       return acc;
     }, {});
@@ -201,9 +221,10 @@ export class ChartRenderer extends Component {
       const firstPoint = activePoints[0];
       const datasetIndex = firstPoint.datasetIndex;
       const label = this.chartInstance.data.labels[firstPoint.index];
-      const clientClinicIds = this.state.datasets[datasetIndex].client_clinic_ids[firstPoint.index];
+      const productIds = this.state.datasets[datasetIndex].product_ids[firstPoint.index];
+      const domain = this.getDrillDownDomain(label, productIds);
 
-      console.log("clientClinicIds :" + clientClinicIds)
+      console.log("domain :", domain)
       
 
       // Check if actionService is accessible and has doAction function
@@ -215,7 +236,8 @@ export class ChartRenderer extends Component {
           view_mode: "tree",
           views: [[false, "tree"]],
           target: "current",
-          domain: [["id", "in", clientClinicIds]], // Uncomment for actual filtering
+          domain: domain,
+          context: { active_test: false }, // Booking yang sudah diarsipkan tetap ikut
         });
       } else {
         console.error('actionService.doAction is not a function or actionService is undefined:', this.actionService);
@@ -228,6 +250,18 @@ export class ChartRenderer extends Component {
 
 
 
+  getDrillDownDomain(label, productIds) {
+    // Line chart: booking pada tanggal tersebut, chart lain: booking yang menjual produk tersebut
+    if (this.props.type === 'line') {
+      return [["booking_date", "=", label]];
+    }
+    const domain = [["product_line_ids.product_id", "in", productIds]];
+    if (this.state.startDate && this.state.endDate) {
+      domain.push(["booking_date", ">=", this.state.startDate], ["booking_date", "<=", this.state.endDate]);
+    }
+    return domain;
+  }
+
   getChartLabel() {
     if (this.props.type === 'doughnut') return 'Kuantitas';
     if (this.props.type === 'bar') return 'Total Price';
@@ -0,0 +1,4 @@
+/** @odoo-module */
+
+// Jenis notifikasi bus berisi perubahan rekap penjualan, dikirim ke user internal
+export const DELTA_NOTIFICATION = "pet_clinic_dashboard/rollup_delta";
@@ -1,22 +1,43 @@
 /** @odoo-module */
 
-const { Component, onWillStart, onMounted } = owl;
+const { Component, onWillStart, onMounted, onWillUnmount } = owl;
 import { useService } from "@web/core/utils/hooks";
+import { DELTA_NOTIFICATION } from "../dashboard_channel";
 
 export class KpiCard extends Component {
     setup() {
         this.orm = useService('orm');
         this.actionService = useService('action'); // Tambahkan ini
+        this.busService = useService('bus_service');
+        this.onRollupDelta = (payload) => this.applyDeltas(payload.deltas);
+        this.onDateChange = () => this.filterData();
+        this.onContainerClick = (evt) => {
+            const card = evt.target.closest('.kpi-card');
+            if (card) {
+                this.handleKpiCardClick(card);
+            }
+        };
         const { startDate, endDate } = this.getStartAndEndOfMonth();
 
         this.state = {
             kpiData: [],
             startDate: startDate,
             endDate: endDate,
+            version: null,
+            current: null,
+            previous: null,
+            previousStart: null,
+            previousEnd: null,
         };
 
         onMounted(() => {
             this.attachEventListeners();
+            this.busService.subscribe(DELTA_NOTIFICATION, this.onRollupDelta);
+        });
+
+        onWillUnmount(() => {
+            this.busService.unsubscribe(DELTA_NOTIFICATION, this.onRollupDelta);
+            this.detachEventListeners();
         });
 
         onWillStart(async () => {
@@ -49,65 +70,61 @@ export class KpiCard extends Component {
 
     async updateKpiData(startDate, endDate) {
         try {
-            console.log(`Updating KPI data from ${startDate} to ${endDate}`);
-
-            const dateDomain = [];
-            if (startDate && endDate) {
-                dateDomain.push(['booking_date', '>=', startDate], ['booking_date', '<=', endDate]);
-            }
-
-            const currentPeriodOrders = await this.orm.call('client_clinic.client_clinic', 'search_read', [
-                dateDomain,
-                ['name', 'total_price', 'booking_date', 'product_line_ids']
-            ]);
-
-            await this.loadProductLines(currentPeriodOrders);
-
-            let previousPeriodOrders = [];
-            if (startDate && endDate) {
-                const previousPeriodStartDate = this.getStartOfPreviousPeriod(startDate, endDate);
-                const previousPeriodEndDate = this.getEndOfPreviousPeriod(startDate, endDate);
+            // Total periode ini dan periode sebelumnya dihitung di server
+            const dashboardData = await this.orm.call('client_clinic.client_clinic', 'get_dashboard_data',
+                [startDate, endDate], { sections: ['kpi'], version: this.state.version });
 
-                previousPeriodOrders = await this.orm.call('client_clinic.client_clinic', 'search_read', [
-                    [['booking_date', '>=', previousPeriodStartDate], ['booking_date', '<=', previousPeriodEndDate]],
-                    ['name', 'total_price', 'booking_date', 'product_line_ids']
-                ]);
-
-                await this.loadProductLines(previousPeriodOrders);
+            // Data di server tidak berubah sejak pemanggilan terakhir, tidak perlu render ulang
+            if (dashboardData.unchanged) {
+                return;
             }
-
-            console.log("currentPeriodOrders: ", currentPeriodOrders);
-            console.log("previousPeriodOrders: ", previousPeriodOrders);
-
-            this.processKpiData(currentPeriodOrders, previousPeriodOrders);
+            this.state.version = dashboardData.version;
+            this.state.startDate = startDate;
+            this.state.endDate = endDate;
+            this.state.current = dashboardData.kpi.current;
+            this.state.previous = dashboardData.kpi.previous;
+            this.state.previousStart = dashboardData.kpi.previous_start || null;
+            this.state.previousEnd = dashboardData.kpi.previous_end || null;
+            this.processKpiData(this.state.current, this.state.previous);
         } catch (error) {
             console.error("Error updating KPI data:", error);
         }
     }
 
-    async loadProductLines(orders) {
-        const allProductLineIds = new Set();
 
-        // Kumpulkan semua product_line_ids
-        for (const order of orders) {
-            if (order.product_line_ids) {
-                order.product_line_ids.forEach(id => allProductLineIds.add(id));
-            }
+    applyDeltas(deltas) {
+        // Tambahkan perubahan dari server ke total yang sudah ada tanpa query ulang
+        const { current, previous, startDate, endDate, previousStart, previousEnd } = this.state;
+        if (!current) {
+            return;
+        }
+        const periods = [[current, startDate, endDate]];
+        if (previousStart && previousEnd) {
+            periods.push([previous, previousStart, previousEnd]);
         }
 
-        // Ambil semua product lines dalam satu panggilan
-        const productLines = await this.orm.call('client_clinic.product_line', 'search_read', [
-            [['id', 'in', [...allProductLineIds]]],
-            ['product_id', 'product_name', 'quantity', 'quantity_selected']
-        ]);
-
-        // Simpan product lines ke masing-masing order
-        for (const order of orders) {
-            order.product_lines = productLines.filter(line => order.product_line_ids.includes(line.id));
+        let changed = false;
+        for (const delta of deltas) {
+            for (const [totals, start, end] of periods) {
+                if ((start && delta.date < start) || (end && delta.date > end)) {
+                    continue;
+                }
+                if (delta.kind === 'booking') {
+                    totals.orders += delta.orders;
+                    totals.revenue += delta.amount;
+                } else {
+                    totals.product_sold += delta.quantity;
+                }
+                changed = true;
+            }
+        }
+        if (changed) {
+            // Token versi tidak lagi sesuai dengan data yang ditampilkan
+            this.state.version = null;
+            this.processKpiData(current, previous);
         }
     }
 
-
     formatLargeNumber(number) {
         if (number >= 1000000) {
             return (number / 1000000).toFixed(1).replace(/\.0$/, '') + ' jt';
@@ -117,39 +134,15 @@ export class KpiCard extends Component {
         return number.toFixed(0);
     }
 
-    getStartOfPreviousPeriod(startDate, endDate) {
-        const currentStart = new Date(startDate);
-        const currentEnd = new Date(endDate);
-        const periodDays = Math.max(1, Math.ceil((currentEnd - currentStart) / (1000 * 60 * 60 * 24)) + 1);
+    processKpiData(currentPeriod, previousPeriod) {
+        const totalOrdersCurrent = currentPeriod.orders || 0;
+        const totalOrdersPrevious = previousPeriod.orders || 0;
 
-        const previousStart = new Date(currentStart);
-        previousStart.setDate(currentStart.getDate() - periodDays);
+        const revenueCurrent = currentPeriod.revenue || 0;
+        const revenuePrevious = previousPeriod.revenue || 0;
 
-        return previousStart.toISOString().split('T')[0];
-    }
-
-    getEndOfPreviousPeriod(startDate) {
-        const currentStart = new Date(startDate);
-        const previousEnd = new Date(currentStart);
-        previousEnd.setDate(currentStart.getDate() - 1);
-
-        return previousEnd.toISOString().split('T')[0];
-    }
-
-    processKpiData(currentPeriodOrders, previousPeriodOrders) {
-        const totalOrdersCurrent = currentPeriodOrders.length || 0;
-        const totalOrdersPrevious = previousPeriodOrders.length || 0;
-
-        const revenueCurrent = currentPeriodOrders.reduce((sum, order) => sum + (order.total_price || 0), 0);
-        const revenuePrevious = previousPeriodOrders.reduce((sum, order) => sum + (order.total_price || 0), 0);
-
-        const totalProductSoldCurrent = currentPeriodOrders.reduce((sum, order) => {
-            return sum + (order.product_lines?.reduce((lineSum, line) => lineSum + (line.quantity_selected || 0), 0) || 0);
-        }, 0);
-
-        const totalProductSoldPrevious = previousPeriodOrders.reduce((sum, order) => {
-            return sum + (order.product_lines?.reduce((lineSum, line) => lineSum + (line.quantity_selected || 0), 0) || 0);
-        }, 0);
+        const totalProductSoldCurrent = currentPeriod.product_sold || 0;
+        const totalProductSoldPrevious = previousPeriod.product_sold || 0;
 
         const revenueFormatted = this.formatLargeNumber(revenueCurrent);
         const totalProductSoldFormatted = totalProductSoldCurrent.toLocaleString('id-ID');
@@ -199,49 +192,30 @@ export class KpiCard extends Component {
             }
         ];
 
-        console.log('KPI Data:', this.state.kpiData);
         this.render();
     }
 
     attachEventListeners() {
-        const startDateInput = document.getElementById("startDate");
-        const endDateInput = document.getElementById("endDate");
-        const kpiCards = document.querySelectorAll('.kpi-card'); // Ganti dengan selector yang sesuai untuk KPI Card
-
-        if (startDateInput) {
-            startDateInput.addEventListener('change', () => {
-                console.log('Start date changed');
-                this.filterData(); // Memanggil filterData saat tanggal mulai berubah
-            });
-        }
-
-        if (endDateInput) {
-            endDateInput.addEventListener('change', () => {
-                console.log('End date changed');
-                this.filterData(); // Memanggil filterData saat tanggal akhir berubah
-            });
-        }
+        // Dipasang sekali saat mount; klik KPI Card ditangani oleh container karena card dibuat ulang setiap render
+        document.getElementById("startDate")?.addEventListener('change', this.onDateChange);
+        document.getElementById("endDate")?.addEventListener('change', this.onDateChange);
+        document.querySelector(".row")?.addEventListener('click', this.onContainerClick);
+    }
 
-        kpiCards.forEach(card => {
-            card.addEventListener('click', (evt) => {
-                this.handleKpiCardClick(evt); // Menghubungkan event click dengan fungsi handler
-            });
-        });
+    detachEventListeners() {
+        document.getElementById("startDate")?.removeEventListener('change', this.onDateChange);
+        document.getElementById("endDate")?.removeEventListener('change', this.onDateChange);
+        document.querySelector(".row")?.removeEventListener('click', this.onContainerClick);
     }
 
-    async handleKpiCardClick(evt) {
-        const cardName = evt.currentTarget.dataset.name; // Mengambil nama dari data attribute
+    async handleKpiCardClick(card) {
+        const cardName = card.dataset.name; // Mengambil nama dari data attribute
         let { startDate, endDate } = this.state; // Mengambil tanggal dari state
 
         // Pastikan tanggal diformat dengan benar (ISO format)
         startDate = new Date(startDate).toISOString().split('T')[0];
         endDate = new Date(endDate).toISOString().split('T')[0];
 
-        console.log('startDate :' + startDate)
-        console.log('endDate :' + endDate)
-
-        console.log(`Redirecting to detail view for ${cardName} from ${startDate} to ${endDate}`);
-
         // Mengarahkan ke tampilan list dengan filter berdasarkan KPI yang relevan
         await this.actionService.doAction({
             name: `${cardName} Detail`,
@@ -254,6 +228,7 @@ export class KpiCard extends Component {
                 ['booking_date', '>=', startDate],
                 ['booking_date', '<=', endDate]
             ],
+            context: { active_test: false }, // Booking yang sudah diarsipkan tetap ikut
         });
     }
 
@@ -263,8 +238,6 @@ export class KpiCard extends Component {
         const startDate = document.getElementById("startDate")?.value;
         const endDate = document.getElementById("endDate")?.value;
 
-        console.log(`Filtering data from ${startDate} to ${endDate}`);
-
         if (!startDate && !endDate) {
             this.updateKpiData(null, null);
         } else {
@@ -307,9 +280,6 @@ export class KpiCard extends Component {
 
             kpiContainer.innerHTML += cardHtml;
         });
-
-        // Setelah render, pasang ulang event listener
-        this.attachEventListeners();
     }
 
 
@@ -4,11 +4,15 @@ import { registry } from "@web/core/registry";
 import { KpiCard } from "./kpi_card/kpi_card";
 import { ChartRenderer } from "./chart_renderer/chart_renderer";
 import { ProductCardList } from "./card_list/card_list";  // Tambahkan import
-const { Component } = owl;
+import { useService } from "@web/core/utils/hooks";
+const { Component, onWillStart } = owl;
 
 export class ClinicDashboard extends Component {
     setup() {
-        // Logic tambahan jika diperlukan
+        // Komponen anak memperbarui datanya sendiri dari delta rekap penjualan. Channel-nya
+        // ditambahkan oleh server untuk user internal, di sini cukup memastikan bus berjalan.
+        this.busService = useService("bus_service");
+        onWillStart(() => this.busService.start());
     }
 }
 